@@ -2,8 +2,49 @@
 Flask application factory for ComfyUI Model Explorer
 """
 from flask import Flask
+from flask.json.provider import DefaultJSONProvider
 import os
 
+# orjson is optional - several times faster than the json module for the
+# large payloads the API returns (the whole database on GET /api/models)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that encodes and decodes with orjson
+    
+    Output matches the default provider (sorted keys, Flask's fallbacks for
+    dates and other non-JSON types); anything orjson can't handle, and
+    pretty-printed debug output, goes through the json module as before.
+    """
+    
+    _OPTIONS = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+                | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+                if orjson is not None else 0)
+    
+    def dumps(self, obj, **kwargs):
+        # jsonify always passes separators; any other option needs json
+        if kwargs.keys() <= {'separators'}:
+            try:
+                return orjson.dumps(obj, default=self.default, option=self._OPTIONS).decode('utf-8')
+            except TypeError:
+                # e.g. ints over 64 bits
+                pass
+        return super().dumps(obj, **kwargs)
+    
+    def loads(self, s, **kwargs):
+        if not kwargs:
+            try:
+                return orjson.loads(s)
+            except orjson.JSONDecodeError:
+                # e.g. NaN - let the json module have a go
+                pass
+        return super().loads(s, **kwargs)
+
 
 def create_app(config_object='config'):
     """
@@ -20,6 +61,9 @@ def create_app(config_object='config'):
                 static_folder='static',
                 template_folder='templates')
     
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
+    
     # Load configuration
     app.config.from_object(config_object)
     
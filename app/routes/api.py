@@ -1,9 +1,9 @@
 """
 API routes for model data operations
 """
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 from datetime import datetime
-from app.services.database import load_db, save_db
+from app.services.database import load_db, save_db, batch_saves, flush_db, db_etag
 from app.services.media import save_uploaded_file
 from app.services.civitai import get_civitai_service
 import subprocess
@@ -13,9 +13,23 @@ bp = Blueprint('api', __name__)
 
 @bp.route('/models', methods=['GET'])
 def get_models():
-    """Load entire database"""
-    db = load_db()
-    return jsonify(db)
+    """
+    Load entire database
+    
+    Tagged with an ETag so the UI's repeat fetches get a 304 instead of the
+    whole database being loaded and serialized again
+    """
+    etag = db_etag()
+    if etag is not None and etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(load_db())
+    
+    if etag is not None:
+        response.set_etag(etag)
+        # Let the browser keep a copy, but always revalidate it
+        response.cache_control.no_cache = True
+    return response
 
 
 @bp.route('/models', methods=['PUT'])
@@ -288,9 +302,8 @@ def upload_media():
         # Get next sequential number for this model
         next_number = get_next_media_number(model)
         
-        # Read and save file with standardized naming
-        file_content = file.read()
-        filename = save_uploaded_file(file_content, file.filename, model_hash_prefix, rating, next_number)
+        # Stream the upload to disk with standardized naming
+        filename = save_uploaded_file(file.stream, file.filename, model_hash_prefix, rating, next_number)
         
         if not filename:
             return jsonify({'success': False, 'error': 'Invalid file type'}), 400
@@ -600,47 +613,59 @@ def scrape_civitai(model_path):
                         print(f"   ✅ Auto-filled baseModel: {version_base}")
                     break
         
-        # ====================================================================
-        # NEW: AUTO-LINK RELATED VERSIONS
-        # ====================================================================
-        from app.services.civitai_version_linking import link_versions_from_civitai_scrape, detect_newer_versions
-        
-        linking_result = link_versions_from_civitai_scrape(model_path, scraped_data)
-        
-        # ====================================================================
-        # NEW: AUTO-DETECT NEWER VERSIONS (after scrape)
-        # ====================================================================
-        try:
-            print(f"🔍 Checking for newer versions after scrape...")
-            db = load_db()  # Reload to get latest links
-            newer_versions_info = detect_newer_versions(db)
+        # Linking, detection and the media audit each load and save the
+        # database - batch them so it is written once, by the save below
+        with batch_saves():
+            # Deferring the scraped fields first makes every load_db() in this
+            # request's batch hand back this same dict, so linking and the
+            # audit build on the scrape instead of on the file
+            save_db(db)
             
-            # Update the model's newVersionAvailable flag
-            if model_path in newer_versions_info:
-                db['models'][model_path]['newVersionAvailable'] = newer_versions_info[model_path]
-                print(f"   ✨ Newer version detected for {model_path}")
-            elif 'newVersionAvailable' in db['models'][model_path]:
-                del db['models'][model_path]['newVersionAvailable']
-                print(f"   ✅ Model is up to date")
-        except Exception as detect_error:
-            print(f"⚠️  Newer version detection failed (non-critical): {detect_error}")
-        
-        # ====================================================================
-        # RUN MEDIA AUDITOR (after scrape)
-        # ====================================================================
-        try:
-            from app.services.media_auditor import audit_media_for_model
-            print(f"🔍 Running media audit for {model_path}...")
-            db_for_audit = load_db()
-            audit_stats = audit_media_for_model(db_for_audit, model_path, db_for_audit['models'][model_path])
-            if audit_stats['removed'] > 0 or audit_stats['added'] > 0:
-                save_db(db_for_audit)
-                print(f"   Media audit: verified={audit_stats['verified']}, removed={audit_stats['removed']}, added={audit_stats['added']}")
-        except Exception as audit_error:
-            print(f"⚠️  Media audit failed (non-critical): {audit_error}")
+            # ====================================================================
+            # NEW: AUTO-LINK RELATED VERSIONS
+            # ====================================================================
+            from app.services.civitai_version_linking import link_versions_from_civitai_scrape, detect_newer_versions
+            
+            linking_result = link_versions_from_civitai_scrape(model_path, scraped_data)
+            
+            # ====================================================================
+            # NEW: AUTO-DETECT NEWER VERSIONS (after scrape)
+            # ====================================================================
+            try:
+                print(f"🔍 Checking for newer versions after scrape...")
+                db = load_db()  # Reload to get latest links
+                newer_versions_info = detect_newer_versions(db)
+                
+                # Update the model's newVersionAvailable flag
+                if model_path in newer_versions_info:
+                    db['models'][model_path]['newVersionAvailable'] = newer_versions_info[model_path]
+                    print(f"   ✨ Newer version detected for {model_path}")
+                elif 'newVersionAvailable' in db['models'][model_path]:
+                    del db['models'][model_path]['newVersionAvailable']
+                    print(f"   ✅ Model is up to date")
+            except Exception as detect_error:
+                print(f"⚠️  Newer version detection failed (non-critical): {detect_error}")
+            
+            # ====================================================================
+            # RUN MEDIA AUDITOR (after scrape)
+            # ====================================================================
+            try:
+                from app.services.media_auditor import audit_media_for_model
+                print(f"🔍 Running media audit for {model_path}...")
+                db_for_audit = load_db()
+                audit_stats = audit_media_for_model(db_for_audit, model_path, db_for_audit['models'][model_path])
+                if audit_stats['removed'] > 0 or audit_stats['added'] > 0:
+                    save_db(db_for_audit)
+                    print(f"   Media audit: verified={audit_stats['verified']}, removed={audit_stats['removed']}, added={audit_stats['added']}")
+            except Exception as audit_error:
+                print(f"⚠️  Media audit failed (non-critical): {audit_error}")
+            
+            # Save - the batch is this thread's own and holds this request's
+            # database, so the flush is this request's write and its result
+            save_db(db)
+            saved = flush_db()
         
-        # Save
-        if save_db(db):
+        if saved:
             response = {
                 'success': True,
                 'data': scraped_data,
@@ -943,10 +968,10 @@ def get_media_metadata(filename):
     Supports ComfyUI workflows, A1111 parameters, and EXIF data
     """
     try:
-        from app.services.metadata_extractor import MetadataExtractor
+        from app.services.metadata_extractor import extract_metadata, get_metadata_summary
         
         # Extract metadata
-        metadata = MetadataExtractor.extract_metadata(filename)
+        metadata = extract_metadata(filename)
         
         if metadata is None:
             return jsonify({
@@ -955,7 +980,7 @@ def get_media_metadata(filename):
             }), 404
         
         # Add summary info
-        status, message, icon = MetadataExtractor.get_metadata_summary(metadata)
+        status, message, icon = get_metadata_summary(metadata)
         
         return jsonify({
             'success': True,
@@ -5,7 +5,7 @@ UPDATED: Now includes automatic version linking after scraping
 import threading
 import time
 from datetime import datetime, timedelta
-from app.services.database import load_db, save_db
+from app.services.database import load_db, save_db, batch_saves
 from app.services.civitai import get_civitai_service
 
 
@@ -262,7 +262,9 @@ class BackgroundScraper:
                 model_to_scrape = self._find_eligible_model()
                 
                 if model_to_scrape:
-                    self._scrape_model(model_to_scrape)
+                    # One database write for the scrape, linking and audit
+                    with batch_saves():
+                        self._scrape_model(model_to_scrape)
                     self.scrapes_today += 1
                     
                     # After scraping, check if we can also heal a model
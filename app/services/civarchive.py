@@ -2,11 +2,17 @@
 CivArchive integration service for model URL recovery
 Provides hash-based search functionality to find archived model pages
 """
+import json
+import os
 import re
+import threading
 import requests
 from bs4 import BeautifulSoup
 from datetime import datetime
 import time
+from config import ARCHIVE_CACHE_FILE
+from app.services.http_session import get_session
+from app.services.rate_limit import rate_limit_window_start
 
 
 class CivArchiveService:
@@ -26,6 +32,10 @@ class CivArchiveService:
         self.rate_limit_delay = 5  # 5 seconds between requests (be respectful)
         self.last_request_time = None
         self.timeout = 30  # 30 second timeout for requests
+        self.cache_ttl_found = 7 * 24 * 3600  # Reuse archive hits for a week
+        self.cache_ttl_not_found = 24 * 3600  # Ask again about misses after a day
+        self._cache = None  # {hash: {cachedAt, result}}, loaded on first search
+        self._cache_lock = threading.Lock()
     
     def wait_for_rate_limit(self):
         """Wait if necessary to respect rate limit"""
@@ -38,6 +48,48 @@ class CivArchiveService:
             print(f"⏳ Archive rate limit: waiting {wait_time:.1f} seconds...")
             time.sleep(wait_time)
     
+    def _get_cached_search(self, file_hash):
+        """Return a cached search result for this hash if it hasn't expired"""
+        with self._cache_lock:
+            if self._cache is None:
+                try:
+                    with open(ARCHIVE_CACHE_FILE, 'r', encoding='utf-8') as f:
+                        self._cache = json.load(f)
+                    if not isinstance(self._cache, dict):
+                        self._cache = {}
+                except (OSError, ValueError):
+                    self._cache = {}
+            
+            entry = self._cache.get(file_hash.lower())
+            try:
+                ttl = self.cache_ttl_found if entry['result']['found'] else self.cache_ttl_not_found
+                if time.time() - entry['cachedAt'] > ttl:
+                    return None
+                return entry['result']
+            except (KeyError, TypeError):
+                # Missing or unreadable entry
+                return None
+    
+    def _cache_search(self, file_hash, search_result):
+        """Cache a completed search result and write the cache atomically"""
+        with self._cache_lock:
+            now = time.time()
+            self._cache[file_hash.lower()] = {'cachedAt': now, 'result': search_result}
+            
+            # Drop expired entries while we're writing anyway
+            max_ttl = max(self.cache_ttl_found, self.cache_ttl_not_found)
+            self._cache = {key: entry for key, entry in self._cache.items()
+                           if isinstance(entry, dict) and now - entry.get('cachedAt', 0) <= max_ttl}
+            
+            try:
+                os.makedirs(os.path.dirname(ARCHIVE_CACHE_FILE), exist_ok=True)
+                temp_file = ARCHIVE_CACHE_FILE + '.tmp'
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    json.dump(self._cache, f)
+                os.replace(temp_file, ARCHIVE_CACHE_FILE)
+            except OSError as e:
+                print(f"⚠️  Could not save archive cache: {e}")
+    
     def convert_huggingface_url_to_details(self, url):
         """
         Convert HuggingFace /resolve/ URL to /blob/ URL for details page
@@ -99,6 +151,13 @@ class CivArchiveService:
             if not re.match(r'^[A-Fa-f0-9]{64}$', file_hash):
                 raise ValueError(f"Invalid SHA256 hash format: {file_hash}")
             
+            # Repeat searches for the same hash are answered from the cache
+            cached = self._get_cached_search(file_hash)
+            if cached is not None:
+                print(f"🔍 Archive search for {file_hash[:16]}... answered from cache "
+                      f"({len(cached['results'])} result(s))")
+                return cached
+            
             # Wait for rate limit
             self.wait_for_rate_limit()
             
@@ -113,12 +172,14 @@ class CivArchiveService:
                 'Accept': 'application/json',
             }
             
-            response = requests.get(api_url, headers=headers, timeout=self.timeout)
+            response = None
+            try:
+                response = get_session().get(api_url, headers=headers, timeout=self.timeout)
+            finally:
+                # Update rate limit timestamp - failed requests count too
+                self.last_request_time = rate_limit_window_start(response, self.rate_limit_delay)
             response.raise_for_status()
             
-            # Update rate limit timestamp
-            self.last_request_time = datetime.now()
-            
             # Parse the JSON response
             json_data = response.json()
             
@@ -139,6 +200,9 @@ class CivArchiveService:
             else:
                 print(f"❌ No results found in archive")
             
+            # Only completed searches are cached - not timeouts or errors
+            self._cache_search(file_hash, search_result)
+            
             return search_result
             
         except requests.Timeout:
@@ -523,11 +587,13 @@ class CivArchiveService:
                 'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
             }
             
-            response = requests.get(snapshot_url, headers=headers, timeout=self.timeout)
+            response = None
+            try:
+                response = get_session().get(snapshot_url, headers=headers, timeout=self.timeout)
+            finally:
+                self.last_request_time = rate_limit_window_start(response, self.rate_limit_delay)
             response.raise_for_status()
             
-            self.last_request_time = datetime.now()
-            
             soup = BeautifulSoup(response.text, 'html.parser')
             
             # Try to extract the original URL from the archive banner
@@ -4,10 +4,23 @@ UPDATED VERSION - Extracts file sizes for version matching
 """
 import re
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from datetime import datetime, timedelta
 import time
 import json
+from app.services.http_session import get_session
+from app.services.rate_limit import rate_limit_window_start
+
+
+# Model and version IDs in CivitAI URLs
+_MODEL_ID_RE = re.compile(r'/models/(\d+)')
+_VERSION_ID_RE = re.compile(r'modelVersionId=(\d+)')
+
+# A model page is only read for its __NEXT_DATA__ script and its tag
+# links, so only those elements (and their contents) are parsed
+_PAGE_STRAINER = SoupStrainer(['script', 'a'])
+_TAG_HREF_RE = re.compile(r'^/tag/')
+_BADGE_CLASS_RE = re.compile(r'Badge')
 
 
 class CivitAIService:
@@ -150,8 +163,8 @@ class CivitAIService:
         - https://civitai.com/models/1811313?modelVersionId=2176505
         - https://civitai.com/models/1811313/cool-model?modelVersionId=2176505
         """
-        model_match = re.search(r'/models/(\d+)', url)
-        version_match = re.search(r'modelVersionId=(\d+)', url)
+        model_match = _MODEL_ID_RE.search(url)
+        version_match = _VERSION_ID_RE.search(url)
         
         return {
             'modelId': model_match.group(1) if model_match else None,
@@ -183,14 +196,16 @@ class CivitAIService:
                 'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
             }
             
-            response = requests.get(civitai_url, headers=headers, timeout=15)
+            response = None
+            try:
+                response = get_session().get(civitai_url, headers=headers, timeout=15)
+            finally:
+                # Update rate limit timestamp - failed requests count too
+                self.last_scrape_time = rate_limit_window_start(response, self.rate_limit_delay)
             response.raise_for_status()
             
-            # Update rate limit timestamp
-            self.last_scrape_time = datetime.now()
-            
             # Parse HTML
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = BeautifulSoup(response.text, 'html.parser', parse_only=_PAGE_STRAINER)
             
             # Extract data from Next.js JSON
             next_data = self._extract_next_data(soup)
@@ -306,14 +321,14 @@ class CivitAIService:
         """
         tags = []
         
-        tag_links = soup.find_all('a', href=re.compile(r'^/tag/'))
+        tag_links = soup.find_all('a', href=_TAG_HREF_RE)
         
         for link in tag_links:
             href = link.get('href', '')
             tag_name = href.replace('/tag/', '').replace('%20', ' ')
             
             # Try to get cleaner name from badge label
-            badge_label = link.find('span', class_=re.compile(r'Badge'))
+            badge_label = link.find('span', class_=_BADGE_CLASS_RE)
             if badge_label:
                 tag_name = badge_label.get_text(strip=True)
             
@@ -6,9 +6,25 @@ BUGFIX: Prevents false positive linking by checking BOTH civitaiModelId AND civi
 """
 from app.services.database import load_db, save_db
 from app.services.civitai import get_civitai_service
+from app.services.model_index import ensure_indexes, size_bucket
+from app.services.console_log import get_logger
+from datetime import datetime
+from functools import lru_cache
+import logging
+import math
 import re
 
 
+logger = get_logger(__name__)
+
+# Compiled once - extract_model_id_from_url runs for every candidate model
+_MODEL_ID_RE = re.compile(r'/models/(\d+)')
+
+# format_size lookup tables
+_SIZE_UNITS = ['B', 'KB', 'MB', 'GB', 'TB', 'PB']
+_SIZE_POW = [1024 ** i for i in range(len(_SIZE_UNITS))]
+
+
 def extract_model_id_from_url(url):
     """
     Extract CivitAI Model ID from URL without requiring a scrape
@@ -22,10 +38,8 @@ def extract_model_id_from_url(url):
     if not url:
         return None
     
-    match = re.search(r'/models/(\d+)', url)
-    if match:
-        return match.group(1)
-    return None
+    match = _MODEL_ID_RE.search(url)
+    return match.group(1) if match else None
 
 
 def get_model_id(model):
@@ -47,11 +61,24 @@ def get_model_id(model):
     # Fall back to parsing the URL
     url = model.get('civitaiUrl', '')
     if url:
-        return extract_model_id_from_url(url)
+        match = _MODEL_ID_RE.search(url)
+        return match.group(1) if match else None
     
     return None
 
 
+def _active_items(db):
+    """
+    List (path, model) pairs for every model not under _missing/
+    
+    Single-pass scans use this; repeated lookups go through ensure_indexes
+    """
+    return [
+        (path, model) for path, model in db['models'].items()
+        if not path.startswith('_missing/')
+    ]
+
+
 def link_versions_from_civitai_scrape(model_path, scraped_data):
     """
     Link versions based on CivitAI scrape results
@@ -74,13 +101,13 @@ def link_versions_from_civitai_scrape(model_path, scraped_data):
             'stats': {...}
         }
     """
-    print(f"\n🔗 Auto-linking versions for: {model_path}")
+    logger.info("\n🔗 Auto-linking versions for: %s", model_path)
     
     db = load_db()
     current_model = db['models'].get(model_path)
     
     if not current_model:
-        print(f"❌ Model not found: {model_path}")
+        logger.error("❌ Model not found: %s", model_path)
         return None
     
     # Get version information from scraped data
@@ -89,120 +116,56 @@ def link_versions_from_civitai_scrape(model_path, scraped_data):
     model_id = scraped_data.get('modelId')
     
     if not versions:
-        print("   No versions found in scraped data")
+        logger.info("   No versions found in scraped data")
         return {'confirmed': [], 'assumed': [], 'stats': {}}
     
     # CRITICAL: If this model only has 1 version, DO NOT create assumed links
     # (prevents matching unrelated models with similar sizes)
     if len(versions) == 1:
-        print(f"   ⚠️  Only 1 version found - skipping assumed linking to prevent false positives")
+        logger.info("   ⚠️  Only 1 version found - skipping assumed linking to prevent false positives")
         return {'confirmed': [], 'assumed': [], 'stats': {}}
     
+    # Cleanup mutates db in place - it is persisted with the links below
+    links_cleaned = 0
     if model_id:
-        clean_conflicting_links(db, model_path, model_id)
-        save_db(db)  # Save after cleanup
-        db = load_db()  # Reload fresh copy
-        current_model = db['models'][model_path]
+        links_cleaned = clean_conflicting_links(db, model_path, model_id)
     
-    print(f"   Found {len(versions)} versions in CivitAI data")
+    logger.info("   Found %d versions in CivitAI data", len(versions))
     
     # Track matches
     confirmed_links = []  # Hash match OR both have CivitAI IDs
     assumed_links = []    # File size match only
     
+    # Index local models once - every version below is looked up against it
+    ensure_indexes(db)
+    
+    # Local models already claimed by an earlier version's hash match
+    used_paths = set()
+    
     # Search for each version in local database
     for version in versions:
-        version_id = version.get('id')
-        version_name = version.get('name', 'Unknown')
-        
         # Skip the current version (ourselves)
-        if version_id == current_version_id:
+        if version.get('id') == current_version_id:
             continue
         
-        # Get file hashes for this version from CivitAI
-        version_files = version.get('files', [])
-        version_hashes = [f.get('hash') for f in version_files if f.get('hash')]
-        version_sizes = [f.get('sizeKB', 0) * 1024 for f in version_files if f.get('sizeKB')]
-        
-        print(f"\n   Searching for: {version_name} (Version ID: {version_id})")
-        if version_hashes:
-            # Show first hash (truncated for readability)
-            first_hash = version_hashes[0]
-            display_hash = first_hash[:16] + '...' if len(first_hash) > 16 else first_hash
-            print(f"      CivitAI hashes: [{display_hash}] ({len(version_hashes)} file(s))")
-        
-        # ========================================================================
-        # TIER 1: HASH MATCH (Most reliable - 100% accuracy!)
-        # ========================================================================
-        hash_match = find_hash_match(db, version_hashes)
-        
-        if hash_match:
-            match_path = hash_match['path']
-            print(f"      ✅ CONFIRMED (Hash Match): {hash_match['name']}")
-            print(f"         🎯 Definitive match - identical file hash!")
-            
-            confirmed_links.append({
-                'path': match_path,
-                'name': hash_match['name'],
-                'versionId': version_id,
-                'versionName': version_name,
-                'method': 'hash_match'  # 🆕 NEW METHOD TYPE
-            })
-            continue
-        
-        # ========================================================================
-        # TIER 2: MODEL ID + VERSION ID MATCH (Confirmed via CivitAI URLs)
-        # ========================================================================
-        confirmed_match = find_confirmed_match(db, model_id, version_id)
-        
-        if confirmed_match:
-            match_path = confirmed_match['path']
-            print(f"      ✅ CONFIRMED (CivitAI IDs): {confirmed_match['name']}")
-            print(f"         Both models have matching CivitAI links")
-            
-            confirmed_links.append({
-                'path': match_path,
-                'name': confirmed_match['name'],
-                'versionId': version_id,
-                'versionName': version_name,
-                'method': 'civitai_id'
-            })
-            continue
-        
-        # ========================================================================
-        # TIER 3: FILE SIZE MATCH (Assumed - last resort, less reliable)
-        # ========================================================================
-        # Only use if we don't have hash data AND we have size data
-        if not version_hashes and version_sizes:
-            assumed_match = find_assumed_match(
-                db, 
-                version_sizes, 
-                exclude_path=model_path, 
-                tolerance=0.01,  # Very strict 1% tolerance to minimize false positives
-                current_model_id=model_id
-            )
-            
-            if assumed_match:
-                match_path = assumed_match['path']
-                match_size = assumed_match['size']
-                match_diff_pct = assumed_match['diff_pct']
-                
-                print(f"      🔍 ASSUMED (File Size): {assumed_match['name']}")
-                print(f"         Matched by file size: {format_size(match_size)} ({match_diff_pct:.2f}% diff)")
-                print(f"         ⚠️  No hash data available - less reliable")
-                
-                assumed_links.append({
-                    'path': match_path,
-                    'name': assumed_match['name'],
-                    'versionId': version_id,
-                    'versionName': version_name,
-                    'method': 'file_size',
-                    'size': match_size,
-                    'diff_pct': match_diff_pct
-                })
+        # Every file of this version hashes to a model we already linked -
+        # matching again would only add a duplicate link
+        if used_paths:
+            version_hashes = [f.get('hash') for f in version.get('files', []) if f.get('hash')]
+            candidate_paths = find_hash_candidates(db, version_hashes)
+            if candidate_paths and candidate_paths <= used_paths:
+                logger.debug("\n   Skipping %s - files already linked", version.get('name', 'Unknown'))
                 continue
         
-        print(f"      ❌ No match found")
+        match = _match_single_version(db, version, model_path, model_id)
+        if match:
+            link_type, link = match
+            if link_type == 'confirmed':
+                confirmed_links.append(link)
+                if link['method'] == 'hash_match':
+                    used_paths.add(link['path'])
+            else:
+                assumed_links.append(link)
     
     # Apply the links to database
     if confirmed_links or assumed_links:
@@ -214,18 +177,22 @@ def link_versions_from_civitai_scrape(model_path, scraped_data):
         
         save_db(db)
         
-        print(f"\n✅ Linking complete:")
-        print(f"   Confirmed links: {len(confirmed_links)}")
+        logger.info("\n✅ Linking complete:")
+        logger.info("   Confirmed links: %d", len(confirmed_links))
         if confirmed_links:
             hash_matches = sum(1 for link in confirmed_links if link.get('method') == 'hash_match')
             id_matches = sum(1 for link in confirmed_links if link.get('method') == 'civitai_id')
             if hash_matches > 0:
-                print(f"     • {hash_matches} by hash (definitive)")
+                logger.info("     • %d by hash (definitive)", hash_matches)
             if id_matches > 0:
-                print(f"     • {id_matches} by CivitAI ID")
-        print(f"   Assumed links: {len(assumed_links)}")
+                logger.info("     • %d by CivitAI ID", id_matches)
+        logger.info("   Assumed links: %d", len(assumed_links))
     else:
-        print(f"\n   No versions found locally")
+        logger.info("\n   No versions found locally")
+        
+        # Still persist any conflicting links removed above
+        if links_cleaned:
+            save_db(db)
     
     # Log activity if any links were created
     if confirmed_links or assumed_links:
@@ -236,7 +203,7 @@ def link_versions_from_civitai_scrape(model_path, scraped_data):
             details = f"{len(confirmed_links)} confirmed, {len(assumed_links)} assumed"
             service.log_activity('Link Versions', model_name, 'success', details)
         except Exception as e:
-            print(f"⚠️  Failed to log linking activity: {e}")
+            logger.warning("⚠️  Failed to log linking activity: %s", e)
     
     return {
         'confirmed': confirmed_links,
@@ -248,6 +215,110 @@ def link_versions_from_civitai_scrape(model_path, scraped_data):
         }
     }
 
+def _match_single_version(db, version, model_path, model_id):
+    """
+    Find the local model for one CivitAI version using the three tiers
+    
+    Args:
+        db: Database dictionary
+        version: Version entry from the scraped CivitAI data
+        model_path: Path to the model that was just scraped (never matched)
+        model_id: CivitAI Model ID of the scraped model
+    
+    Returns:
+        ('confirmed', link) or ('assumed', link), or None if no local match
+    """
+    version_id = version.get('id')
+    version_name = version.get('name', 'Unknown')
+    
+    # Get file hashes for this version from CivitAI
+    version_files = version.get('files', [])
+    version_hashes = [f.get('hash') for f in version_files if f.get('hash')]
+    
+    logger.debug("\n   Searching for: %s (Version ID: %s)", version_name, version_id)
+    if version_hashes and logger.isEnabledFor(logging.DEBUG):
+        # Show first hash (truncated for readability)
+        first_hash = version_hashes[0]
+        display_hash = first_hash[:16] + '...' if len(first_hash) > 16 else first_hash
+        logger.debug("      CivitAI hashes: [%s] (%d file(s))", display_hash, len(version_hashes))
+    
+    # ========================================================================
+    # TIER 1: HASH MATCH (Most reliable - 100% accuracy!)
+    # ========================================================================
+    hash_match = find_hash_match(db, version_hashes)
+    
+    if hash_match:
+        match_path = hash_match['path']
+        logger.info("      ✅ CONFIRMED (Hash Match): %s", hash_match['name'])
+        logger.debug("         🎯 Definitive match - identical file hash!")
+        
+        return 'confirmed', {
+            'path': match_path,
+            'name': hash_match['name'],
+            'versionId': version_id,
+            'versionName': version_name,
+            'method': 'hash_match'  # 🆕 NEW METHOD TYPE
+        }
+    
+    # ========================================================================
+    # TIER 2: MODEL ID + VERSION ID MATCH (Confirmed via CivitAI URLs)
+    # ========================================================================
+    confirmed_match = find_confirmed_match(db, model_id, version_id)
+    
+    if confirmed_match:
+        match_path = confirmed_match['path']
+        logger.info("      ✅ CONFIRMED (CivitAI IDs): %s", confirmed_match['name'])
+        logger.debug("         Both models have matching CivitAI links")
+        
+        return 'confirmed', {
+            'path': match_path,
+            'name': confirmed_match['name'],
+            'versionId': version_id,
+            'versionName': version_name,
+            'method': 'civitai_id'
+        }
+    
+    # ========================================================================
+    # TIER 3: FILE SIZE MATCH (Assumed - last resort, less reliable)
+    # ========================================================================
+    # Only use if we don't have hash data AND we have size data
+    # (sizes are only gathered here - versions with hashes never need them)
+    version_sizes = [] if version_hashes else [
+        size_kb * 1024 for size_kb in (f.get('sizeKB') for f in version_files) if size_kb
+    ]
+    if version_sizes:
+        assumed_match = find_assumed_match(
+            db, 
+            version_sizes, 
+            exclude_path=model_path, 
+            tolerance=0.01,  # Very strict 1% tolerance to minimize false positives
+            current_model_id=model_id
+        )
+        
+        if assumed_match:
+            match_path = assumed_match['path']
+            match_size = assumed_match['size']
+            match_diff_pct = assumed_match['diff_pct']
+            
+            logger.info("      🔍 ASSUMED (File Size): %s", assumed_match['name'])
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("         Matched by file size: %s (%.2f%% diff)", format_size(match_size), match_diff_pct)
+                logger.debug("         ⚠️  No hash data available - less reliable")
+            
+            return 'assumed', {
+                'path': match_path,
+                'name': assumed_match['name'],
+                'versionId': version_id,
+                'versionName': version_name,
+                'method': 'file_size',
+                'size': match_size,
+                'diff_pct': match_diff_pct
+            }
+    
+    logger.debug("      ❌ No match found")
+    return None
+
+
 def find_hash_match(db, target_hashes):
     """
     Find a model that has a matching file hash
@@ -263,73 +334,69 @@ def find_hash_match(db, target_hashes):
     if not target_hashes:
         return None
     
-    for path, model in db['models'].items():
-        # Skip missing models
-        if path.startswith('_missing/'):
-            continue
-        
-        # Check main file hash
-        model_hash = (model.get('fileHash') or '').upper()
+    indexes = ensure_indexes(db)
+    
+    # Fast path: most versions have a single file, so a single hash -
+    # at most two bucket probes and no merging across targets
+    if len(target_hashes) == 1:
+        candidates = [bucket[0] for bucket in _hash_buckets(indexes, target_hashes[0])]
+        if not candidates:
+            return None
+        best_entry = min(candidates, key=lambda entry: entry[0])
+    else:
+        # Earliest entry across all targets = the model a full scan would hit first
+        best_entry = None
         
-        if model_hash and hash_matches(model_hash, target_hashes):
-            return {
-                'path': path,
-                'name': model.get('name', 'Unknown'),
-                'hash': model_hash
-            }
+        for target_hash in target_hashes:
+            for bucket in _hash_buckets(indexes, target_hash):
+                if best_entry is None or bucket[0][0] < best_entry[0]:
+                    best_entry = bucket[0]
         
-        # Check variant hashes
-        if model.get('variants'):
-            high_hash = (model['variants'].get('highHash') or '').upper()
-            if high_hash and hash_matches(high_hash, target_hashes):
-                return {
-                    'path': path,
-                    'name': model.get('name', 'Unknown'),
-                    'hash': high_hash
-                }
-            
-            low_hash = (model['variants'].get('lowHash') or '').upper()
-            if low_hash and hash_matches(low_hash, target_hashes):
-                return {
-                    'path': path,
-                    'name': model.get('name', 'Unknown'),
-                    'hash': low_hash
-                }
+        if best_entry is None:
+            return None
     
-    return None
+    _, path, model, model_hash = best_entry
+    return {
+        'path': path,
+        'name': model.get('name', 'Unknown'),
+        'hash': model_hash
+    }
 
 
-def hash_matches(model_hash, target_hashes):
+def find_hash_candidates(db, target_hashes):
     """
-    Check if a model hash matches any of the target hashes
-    Handles both full SHA256 (64 chars) and partial AutoV2 (10 chars) matches
+    Get every local model path that matches any of the target hashes
+    
+    Returns:
+        Set of paths (empty if nothing matches)
     """
-    if not model_hash:
-        return False
+    indexes = ensure_indexes(db)
+    return {
+        entry[1]
+        for target_hash in target_hashes
+        for bucket in _hash_buckets(indexes, target_hash)
+        for entry in bucket
+    }
+
+
+def _hash_buckets(indexes, target_hash):
+    """Non-empty hash index buckets that match one target hash"""
+    target_upper = (target_hash or '').upper()
+    if not target_upper:
+        return []
     
-    model_upper = model_hash.upper()
+    # Method 1: Exact match (both are full SHA256 or both are AutoV2)
+    buckets = [indexes['hashes'].get(target_upper)]
     
-    for target_hash in target_hashes:
-        if not target_hash:
-            continue
-        
-        target_upper = target_hash.upper()
-        
-        # Method 1: Exact match (both are full SHA256 or both are AutoV2)
-        if model_upper == target_upper:
-            return True
-        
-        # Method 2: Partial match - CivitAI provided AutoV2 (10 chars), we have full SHA256 (64 chars)
-        if len(target_upper) == 10 and len(model_upper) == 64:
-            if model_upper.startswith(target_upper):
-                return True
-        
-        # Method 3: Reverse partial - we have AutoV2 (10 chars), CivitAI provided full SHA256 (64 chars)
-        if len(model_upper) == 10 and len(target_upper) == 64:
-            if target_upper.startswith(model_upper):
-                return True
+    # Method 2: Partial match - CivitAI provided AutoV2 (10 chars), we have full SHA256 (64 chars)
+    if len(target_upper) == 10:
+        buckets.append(indexes['prefixes'].get(target_upper))
+    
+    # Method 3: Reverse partial - we have AutoV2 (10 chars), CivitAI provided full SHA256 (64 chars)
+    elif len(target_upper) == 64:
+        buckets.append(indexes['hashes'].get(target_upper[:10]))
     
-    return False
+    return [bucket for bucket in buckets if bucket]
 
 
 def find_confirmed_match(db, model_id, version_id):
@@ -337,22 +404,17 @@ def find_confirmed_match(db, model_id, version_id):
     Find a model that has the SAME CivitAI Model ID and Version ID
     This is a CONFIRMED match - both models have CivitAI links
     """
-    for path, model in db['models'].items():
-        # Skip missing models
-        if path.startswith('_missing/'):
-            continue
-        
-        # Check if this model has matching IDs
-        if (model.get('civitaiModelId') == model_id and 
-            model.get('civitaiVersionId') == version_id):
-            return {
-                'path': path,
-                'name': model.get('name', 'Unknown'),
-                'modelId': model_id,
-                'versionId': version_id
-            }
+    bucket = ensure_indexes(db)['ids'].get((model_id, version_id))
+    if not bucket:
+        return None
     
-    return None
+    _, path, model, _ = bucket[0]
+    return {
+        'path': path,
+        'name': model.get('name', 'Unknown'),
+        'modelId': model_id,
+        'versionId': version_id
+    }
 
 
 def find_assumed_match(db, target_sizes, exclude_path=None, tolerance=0.001, current_model_id=None):
@@ -375,55 +437,67 @@ def find_assumed_match(db, target_sizes, exclude_path=None, tolerance=0.001, cur
     best_match = None
     best_diff = float('inf')
     
-    for path, model in db['models'].items():
-        # Skip missing models and ourselves
-        if path.startswith('_missing/') or path == exclude_path:
+    # Zero sizes can never match - drop them once instead of per candidate
+    targets = [target_size for target_size in target_sizes if target_size]
+    if not targets:
+        return None
+    
+    # Compared against every candidate's family - convert once
+    current_id_str = str(current_model_id) if current_model_id else None
+    
+    indexes = ensure_indexes(db)
+    family_ids = indexes['family_ids']
+    
+    # A match is within a few percent of a target, so it can only sit in the
+    # target's log2 bucket or a neighbouring one. Wide tolerances and odd
+    # (negative) sizes fall back to checking every sized model.
+    if tolerance < 0.5 and all(target_size > 0 for target_size in targets):
+        candidates = {}
+        for target_size in targets:
+            k = size_bucket(target_size)
+            for bucket in (k - 1, k, k + 1):
+                for entry in indexes['size_buckets'].get(bucket, []):
+                    candidates[entry[1]] = entry
+        # Database order, so ties go to the same model as a full scan
+        candidates = sorted(candidates.values(), key=lambda entry: entry[0])
+    else:
+        candidates = indexes['sizes']
+    
+    for _, path, model, model_size in candidates:
+        # Skip ourselves
+        if path == exclude_path:
             continue
         
         # BUGFIX: Get Model ID from EITHER scraped data OR URL parsing
-        other_model_id = get_model_id(model)
+        # (get_model_id, cached as a string by the index)
+        other_model_id = family_ids[path]
         
-        # SAFETY CHECK 1: If we can determine the other model's ID (even from URL),
-        # check if they're from different families
-        if other_model_id and current_model_id:
-            if str(other_model_id) != str(current_model_id):
+        if other_model_id and current_id_str:
+            # SAFETY CHECK 1: If we can determine the other model's ID (even from URL),
+            # check if they're from different families
+            if other_model_id != current_id_str:
                 # Different CivitAI families - NEVER match!
                 # This prevents linking "Aduare Style" with "cat_looking_at_itself"
                 continue
-        
-        # SAFETY CHECK 2: If other model has SAME Model ID but different Version ID,
-        # it should have been found by confirmed match - skip to avoid duplicates
-        if other_model_id and current_model_id and str(other_model_id) == str(current_model_id):
-            other_version_id = model.get('civitaiVersionId')
-            if other_version_id:
+            
+            # SAFETY CHECK 2: If other model has SAME Model ID but different Version ID,
+            # it should have been found by confirmed match - skip to avoid duplicates
+            if model.get('civitaiVersionId'):
                 # Has both IDs - should have been confirmed match
                 continue
         
-        # Get model's file size
-        model_size = model.get('fileSize') or model.get('_fileSize', 0)
-        if model_size == 0:
-            continue
+        # Closest of the possible sizes from CivitAI (percentage difference)
+        diff_pct = min(abs(model_size - target_size) / target_size for target_size in targets)
         
-        # Check against all possible sizes from CivitAI
-        for target_size in target_sizes:
-            if target_size == 0:
-                continue
-            
-            # Calculate percentage difference
-            diff = abs(model_size - target_size)
-            diff_pct = diff / target_size
-            
-            # Within tolerance?
-            if diff_pct <= tolerance:
-                # Keep track of best match (smallest difference)
-                if diff_pct < best_diff:
-                    best_diff = diff_pct
-                    best_match = {
-                        'path': path,
-                        'name': model.get('name', 'Unknown'),
-                        'size': model_size,
-                        'diff_pct': diff_pct * 100  # Convert to percentage
-                    }
+        # Within tolerance? Keep track of best match (smallest difference)
+        if diff_pct <= tolerance and diff_pct < best_diff:
+            best_diff = diff_pct
+            best_match = {
+                'path': path,
+                'name': model.get('name', 'Unknown'),
+                'size': model_size,
+                'diff_pct': diff_pct * 100  # Convert to percentage
+            }
     
     return best_match
 
@@ -434,7 +508,8 @@ def apply_version_links(db, main_path, confirmed_links, assumed_links):
     
     Creates bidirectional links and marks assumed links with metadata
     """
-    main_model = db['models'][main_path]
+    models = db['models']
+    main_model = models[main_path]
     
     # Initialize relatedVersions if needed
     if 'relatedVersions' not in main_model:
@@ -444,12 +519,17 @@ def apply_version_links(db, main_path, confirmed_links, assumed_links):
     if 'linkMetadata' not in main_model:
         main_model['linkMetadata'] = {}
     
+    # Set mirror of relatedVersions for O(1) membership checks -
+    # the list itself stays in insertion order for the UI
+    main_related = set(main_model['relatedVersions'])
+    
     # Process confirmed links
     for link in confirmed_links:
         link_path = link['path']
         
         # Add to main model's relatedVersions
-        if link_path not in main_model['relatedVersions']:
+        if link_path not in main_related:
+            main_related.add(link_path)
             main_model['relatedVersions'].append(link_path)
         
         # Mark as confirmed
@@ -461,7 +541,7 @@ def apply_version_links(db, main_path, confirmed_links, assumed_links):
         }
         
         # Add reverse link
-        linked_model = db['models'][link_path]
+        linked_model = models[link_path]
         if 'relatedVersions' not in linked_model:
             linked_model['relatedVersions'] = []
         if main_path not in linked_model['relatedVersions']:
@@ -480,7 +560,8 @@ def apply_version_links(db, main_path, confirmed_links, assumed_links):
         link_path = link['path']
         
         # Add to main model's relatedVersions
-        if link_path not in main_model['relatedVersions']:
+        if link_path not in main_related:
+            main_related.add(link_path)
             main_model['relatedVersions'].append(link_path)
         
         # Mark as assumed with size info
@@ -493,7 +574,7 @@ def apply_version_links(db, main_path, confirmed_links, assumed_links):
         }
         
         # Add reverse link
-        linked_model = db['models'][link_path]
+        linked_model = models[link_path]
         if 'relatedVersions' not in linked_model:
             linked_model['relatedVersions'] = []
         if main_path not in linked_model['relatedVersions']:
@@ -524,7 +605,8 @@ def synchronize_version_family(db, model_path):
         db: Database dictionary
         model_path: Path to the model that was just rescraped
     """
-    model = db['models'].get(model_path)
+    models = db['models']
+    model = models.get(model_path)
     if not model or 'relatedVersions' not in model:
         return
     
@@ -540,26 +622,28 @@ def synchronize_version_family(db, model_path):
         
         family.add(current_path)
         
-        current_model = db['models'].get(current_path)
+        current_model = models.get(current_path)
         if current_model and 'relatedVersions' in current_model:
             for related in current_model['relatedVersions']:
                 if related not in family:
                     queue.append(related)
     
-    print(f"   🔄 Synchronizing version family: {len(family)} models")
+    logger.info("   🔄 Synchronizing version family: %d models", len(family))
     
     # Now ensure every model in the family knows about every other model
     for member_path in family:
-        member = db['models'].get(member_path)
+        member = models.get(member_path)
         if not member:
             continue
         
         if 'relatedVersions' not in member:
             member['relatedVersions'] = []
+        member_related = set(member['relatedVersions'])
         
         # Add all other family members to this model's relatedVersions
         for other_path in family:
-            if other_path != member_path and other_path not in member['relatedVersions']:
+            if other_path != member_path and other_path not in member_related:
+                member_related.add(other_path)
                 member['relatedVersions'].append(other_path)
                 
                 # Also ensure linkMetadata exists (inherit from any existing link)
@@ -574,7 +658,7 @@ def synchronize_version_family(db, model_path):
                         'method': 'family_sync'
                     }
     
-    print(f"   ✅ Family synchronized: all {len(family)} models now linked")
+    logger.info("   ✅ Family synchronized: all %d models now linked", len(family))
 
 
 def upgrade_assumed_to_confirmed(db, path1, path2, model_id, version_id):
@@ -583,9 +667,11 @@ def upgrade_assumed_to_confirmed(db, path1, path2, model_id, version_id):
     
     Call this when a model that was assumed-linked gets its CivitAI URL added
     """
+    models = db['models']
+    
     # Update link metadata for path1
-    if path1 in db['models']:
-        model1 = db['models'][path1]
+    if path1 in models:
+        model1 = models[path1]
         if 'linkMetadata' in model1 and path2 in model1['linkMetadata']:
             model1['linkMetadata'][path2] = {
                 'type': 'confirmed',
@@ -594,8 +680,8 @@ def upgrade_assumed_to_confirmed(db, path1, path2, model_id, version_id):
             }
     
     # Update link metadata for path2
-    if path2 in db['models']:
-        model2 = db['models'][path2]
+    if path2 in models:
+        model2 = models[path2]
         if 'linkMetadata' in model2 and path1 in model2['linkMetadata']:
             model2['linkMetadata'][path1] = {
                 'type': 'confirmed',
@@ -603,7 +689,7 @@ def upgrade_assumed_to_confirmed(db, path1, path2, model_id, version_id):
                 'versionId': version_id
             }
     
-    print(f"✅ Upgraded link to CONFIRMED: {path1} ↔ {path2}")
+    logger.info("✅ Upgraded link to CONFIRMED: %s ↔ %s", path1, path2)
 
 
 def clean_conflicting_links(db, model_path, confirmed_model_id):
@@ -615,23 +701,28 @@ def clean_conflicting_links(db, model_path, confirmed_model_id):
         db: Database dictionary
         model_path: Path to the model we just scraped
         confirmed_model_id: The confirmed CivitAI Model ID from scraping
+        
+    Returns:
+        Number of conflicting links removed
     """
-    print(f"\n🧹 Cleaning conflicting links for: {model_path}")
+    logger.info("\n🧹 Cleaning conflicting links for: %s", model_path)
     
-    model = db['models'].get(model_path)
+    models = db['models']
+    model = models.get(model_path)
     if not model:
-        return
+        return 0
     
     related_versions = model.get('relatedVersions', [])
     if not related_versions:
-        print("   No related versions to clean")
-        return
+        logger.debug("   No related versions to clean")
+        return 0
     
-    # Check each link
+    # Check each link (get_model_id already returns strings)
+    confirmed_id_str = str(confirmed_model_id)
     links_to_remove = []
     
     for related_path in related_versions:
-        related_model = db['models'].get(related_path)
+        related_model = models.get(related_path)
         if not related_model:
             links_to_remove.append(related_path)
             continue
@@ -639,18 +730,19 @@ def clean_conflicting_links(db, model_path, confirmed_model_id):
         # BUGFIX: Check BOTH scraped ID and URL-parsed ID
         other_model_id = get_model_id(related_model)
         
-        if other_model_id and str(other_model_id) != str(confirmed_model_id):
+        if other_model_id and other_model_id != confirmed_id_str:
             # CONFLICT DETECTED: Different families linked together!
-            print(f"   ❌ Removing conflicting link: {related_model.get('name', 'Unknown')}")
-            print(f"      This model: {confirmed_model_id}, Other model: {other_model_id}")
+            logger.info("   ❌ Removing conflicting link: %s", related_model.get('name', 'Unknown'))
+            logger.info("      This model: %s, Other model: %s", confirmed_model_id, other_model_id)
             links_to_remove.append(related_path)
     
     # Remove conflicting links
     if links_to_remove:
-        # Remove from this model's relatedVersions
+        # Remove from this model's relatedVersions (set for O(1) membership)
+        removed = set(links_to_remove)
         model['relatedVersions'] = [
             path for path in related_versions 
-            if path not in links_to_remove
+            if path not in removed
         ]
         
         # Remove from linkMetadata
@@ -661,7 +753,7 @@ def clean_conflicting_links(db, model_path, confirmed_model_id):
         
         # Remove reverse links from the other models
         for related_path in links_to_remove:
-            related_model = db['models'].get(related_path)
+            related_model = models.get(related_path)
             if not related_model:
                 continue
             
@@ -677,18 +769,48 @@ def clean_conflicting_links(db, model_path, confirmed_model_id):
                 if model_path in related_model['linkMetadata']:
                     del related_model['linkMetadata'][model_path]
         
-        print(f"   ✅ Removed {len(links_to_remove)} conflicting link(s)")
+        logger.info("   ✅ Removed %d conflicting link(s)", len(links_to_remove))
     else:
-        print("   ✅ No conflicting links found")
+        logger.debug("   ✅ No conflicting links found")
+    
+    return len(links_to_remove)
 
 
 def format_size(bytes_val):
     """Format bytes as human-readable size"""
-    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-        if bytes_val < 1024.0:
-            return f"{bytes_val:.2f} {unit}"
-        bytes_val /= 1024.0
-    return f"{bytes_val:.2f} PB"
+    if bytes_val < 1024:
+        return f"{bytes_val:.2f} B"
+    
+    # Every 10 bits is one unit step
+    if isinstance(bytes_val, int):
+        # Exact for ints - no float conversion at all
+        i = min(len(_SIZE_UNITS) - 1, (bytes_val.bit_length() - 1) // 10)
+    else:
+        # Step back if log2 rounded up just below a unit boundary
+        i = min(len(_SIZE_UNITS) - 1, int(math.log2(bytes_val)) // 10)
+        if bytes_val < _SIZE_POW[i]:
+            i -= 1
+    return f"{bytes_val / _SIZE_POW[i]:.2f} {_SIZE_UNITS[i]}"
+
+
+@lru_cache(maxsize=4096)
+def _parse_ts(published_at):
+    """
+    Parse a CivitAI ISO timestamp into epoch seconds
+    
+    Cached by raw string - the same publishedAt values come up for every
+    model in a version family on every detection run
+    
+    Returns:
+        Float timestamp, or None if missing/unparseable
+    """
+    if not published_at:
+        return None
+    
+    try:
+        return datetime.fromisoformat(published_at.replace('Z', '+00:00')).timestamp()
+    except (ValueError, AttributeError):
+        return None
 
 
 def detect_newer_versions(db):
@@ -703,17 +825,12 @@ def detect_newer_versions(db):
     Returns:
         Dictionary mapping model paths to their newer version info
     """
-    from datetime import datetime, timedelta
-    
-    print("\n🔍 Detecting newer versions...")
+    logger.info("\n🔍 Detecting newer versions...")
     
+    models = db['models']
     newer_versions_found = {}
     
-    for path, model in db['models'].items():
-        # Skip missing models
-        if path.startswith('_missing/'):
-            continue
-        
+    for path, model in _active_items(db):
         # Check if model has CivitAI data with versions
         civitai_data = model.get('civitaiData')
         if not civitai_data or not civitai_data.get('versions'):
@@ -737,9 +854,8 @@ def detect_newer_versions(db):
             continue
         
         # Parse the current date
-        try:
-            current_date = datetime.fromisoformat(current_published_date.replace('Z', '+00:00'))
-        except (ValueError, AttributeError):
+        current_date = _parse_ts(current_published_date)
+        if current_date is None:
             continue
         
         # Find the newest version date among all owned versions (current + related)
@@ -749,7 +865,7 @@ def detect_newer_versions(db):
         # Check related versions for their dates
         if model.get('relatedVersions'):
             for related_path in model['relatedVersions']:
-                related_model = db['models'].get(related_path)
+                related_model = models.get(related_path)
                 if related_model and related_model.get('civitaiVersionId'):
                     related_vid = str(related_model['civitaiVersionId'])
                     owned_version_ids.add(related_vid)
@@ -757,11 +873,9 @@ def detect_newer_versions(db):
                     # Find this version's date in civitaiData
                     for version in civitai_data['versions']:
                         if str(version.get('id')) == related_vid:
-                            try:
-                                rel_date = datetime.fromisoformat(version.get('publishedAt', '').replace('Z', '+00:00'))
+                            rel_date = _parse_ts(version.get('publishedAt'))
+                            if rel_date is not None:
                                 owned_version_dates.append(rel_date)
-                            except (ValueError, AttributeError):
-                                pass
                             break
         
         # Get the newest owned version date
@@ -778,34 +892,29 @@ def detect_newer_versions(db):
             if version_id in owned_version_ids:
                 continue
             
-            if not version_published:
+            version_date = _parse_ts(version_published)
+            if version_date is None:
                 continue
             
-            try:
-                version_date = datetime.fromisoformat(version_published.replace('Z', '+00:00'))
-                
-                # Check if this version is newer than our newest owned version
-                # Use a small tolerance to avoid treating versions with
-                # practically identical publish timestamps (e.g. high/low
-                # pairs) as newer due to tiny timestamp differences.
-                if (version_date - newest_owned_date) > timedelta(seconds=1):
-                    newer_versions.append({
-                        'versionId': version_id,
-                        'versionName': version.get('name', 'Unknown'),
-                        'publishedAt': version_published,
-                        'baseModel': version.get('baseModel', 'Unknown'),
-                        'available': version.get('available', True),
-                        'files': version.get('files', [])
-                    })
-            except (ValueError, AttributeError):
-                continue
+            # Check if this version is newer than our newest owned version
+            # Use a small tolerance to avoid treating versions with
+            # practically identical publish timestamps (e.g. high/low
+            # pairs) as newer due to tiny timestamp differences.
+            if (version_date - newest_owned_date) > 1:
+                newer_versions.append({
+                    'versionId': version_id,
+                    'versionName': version.get('name', 'Unknown'),
+                    'publishedAt': version_published,
+                    'baseModel': version.get('baseModel', 'Unknown'),
+                    'available': version.get('available', True),
+                    'files': version.get('files', [])
+                })
         
         # If newer versions found, store the info
         if newer_versions:
-            # Sort by date (newest first)
-            newer_versions.sort(key=lambda v: v['publishedAt'], reverse=True)
-            
-            newest = newer_versions[0]
+            # Only the newest one is needed up front - a linear max() instead of
+            # sorting; allNewerVersions keeps CivitAI's order
+            newest = max(newer_versions, key=lambda v: v['publishedAt'])
             newer_versions_found[path] = {
                 'hasNewerVersion': True,
                 'newestVersion': newest,
@@ -813,9 +922,9 @@ def detect_newer_versions(db):
                 'count': len(newer_versions)
             }
             
-            print(f"   📢 {model.get('name', 'Unknown')}: {len(newer_versions)} newer version(s) found!")
-            print(f"      Newest: {newest['versionName']} ({newest['publishedAt'][:10]})")
+            logger.info("   📢 %s: %d newer version(s) found!", model.get('name', 'Unknown'), len(newer_versions))
+            logger.debug("      Newest: %s (%s)", newest['versionName'], newest['publishedAt'][:10])
     
-    print(f"\n✅ Detection complete: {len(newer_versions_found)} model(s) have newer versions")
+    logger.info("\n✅ Detection complete: %d model(s) have newer versions", len(newer_versions_found))
     
     return newer_versions_found
\ No newline at end of file
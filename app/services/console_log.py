@@ -0,0 +1,32 @@
+"""
+Console logging for services
+
+The app reports progress on stdout (emoji and all) rather than through a
+configured logging setup. get_logger gives a service a logger that prints
+the same way by default, but with lazy formatting and levels, so chatty
+per-item messages can sit at DEBUG and cost nothing unless enabled.
+"""
+import logging
+import sys
+
+
+def get_logger(name):
+    """
+    Get a logger that writes bare messages to stdout at INFO
+    
+    Leaves the logger alone if handlers were already configured for it,
+    so a real logging setup takes precedence.
+    
+    Args:
+        name: Logger name (normally the module's __name__)
+    """
+    logger = logging.getLogger(name)
+    
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    
+    return logger
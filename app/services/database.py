@@ -1,19 +1,82 @@
 """
 Database operations for model metadata
 """
+import hashlib
 import json
+import mmap
 import os
+import shutil
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 from config import DB_FILE, BACKUP_DIR, MAX_BACKUPS
+from app.services.model_index import INDEX_KEY
+from app.services.console_log import get_logger
+
+# orjson is optional - several times faster than the json module for
+# the whole-database dumps and loads done here
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# zstandard is optional - when installed, save-time backups are stored
+# compressed (JSON shrinks several times over at level 3)
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ZSTD_SUFFIX = '.zst'
+
+
+logger = get_logger(__name__)
+
+# Sidecar holding the content hash of the newest backup (see _write_db)
+LAST_BACKUP_HASH_FILE = os.path.join(BACKUP_DIR, '.last_backup_hash')
+
+
+class _BatchState(threading.local):
+    """
+    Batched saves (see batch_saves), tracked per thread
+    
+    Only the thread that opened a batch defers its saves and is handed the
+    pending database; request threads running alongside the background
+    scraper's batch keep reading and writing the file directly.
+    """
+    depth = 0
+    pending = None
+
+
+_batch = _BatchState()
+
+# Serializes writes to the database file and its backups across threads
+_write_lock = threading.Lock()
 
 
 def load_db():
-    """Load database from JSON file"""
+    """
+    Load database from JSON file
+    
+    Inside batch_saves(), returns this thread's not-yet-written database if
+    there is one
+    """
+    if _batch.pending is not None:
+        # Indexes may be stale after whoever saved it kept editing
+        _batch.pending.pop(INDEX_KEY, None)
+        return _batch.pending
+    
     try:
         if os.path.exists(DB_FILE):
-            with open(DB_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with open(DB_FILE, 'rb') as f:
+                # orjson parses straight from a read-only mapping, so the
+                # file is never copied into a bytes object first
+                if orjson is not None and os.fstat(f.fileno()).st_size:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        with memoryview(mapped) as view:
+                            return _decode_db(view)
+                return _decode_db(f.read())
         else:
             # Return empty database if file doesn't exist
             return {
@@ -21,13 +84,98 @@ def load_db():
                 "models": {}
             }
     except Exception as e:
-        print(f"Error loading database: {e}")
+        logger.error("Error loading database: %s", e)
         return {
             "version": "1.0.0",
             "models": {}
         }
 
 
+def db_etag():
+    """
+    Cache validator for the saved database, from the file's mtime and size
+    
+    Every save replaces the file, so the tag changes with each write without
+    reading or hashing the contents.
+    
+    Returns:
+        ETag string, or None if there is no file yet or this thread's batch
+        is holding unsaved changes (the file is stale then)
+    """
+    if _batch.pending is not None:
+        return None
+    
+    try:
+        stat = os.stat(DB_FILE)
+    except OSError:
+        return None
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+def _decode_db(raw):
+    """Parse database JSON from bytes or a memoryview, with orjson when available"""
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            # e.g. NaN written by the json module - let it have a go
+            pass
+    return json.loads(bytes(raw).decode('utf-8'))
+
+
+def _encode_db(data):
+    """Serialize the database to indented UTF-8 JSON bytes, with orjson when available"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # Values orjson can't represent (e.g. ints over 64 bits)
+            pass
+    return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+
+
+def _file_hash(path):
+    """Content hash of a file, read in chunks"""
+    hasher = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        while chunk := f.read(1024 * 1024):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _read_last_backup_hash():
+    """Content hash of the database as of the newest backup, if recorded"""
+    try:
+        with open(LAST_BACKUP_HASH_FILE, 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _write_last_backup_hash(content_hash):
+    """Record the content hash of the backup just created"""
+    try:
+        with open(LAST_BACKUP_HASH_FILE, 'w', encoding='utf-8') as f:
+            f.write(content_hash)
+    except OSError as e:
+        logger.warning("⚠️  Failed to record backup hash: %s", e)
+
+
+def _scan_backups():
+    """
+    List backup files in BACKUP_DIR as os.DirEntry objects
+    
+    Entries cache their stat() result (free on Windows, one call on POSIX),
+    so callers needing mtime/size don't stat by path again.
+    """
+    with os.scandir(BACKUP_DIR) as entries:
+        return [
+            entry for entry in entries
+            if entry.name.startswith('modeldb_')
+            and entry.name.endswith(('.json', '.json' + ZSTD_SUFFIX))
+        ]
+
+
 def rotate_backups():
     """
     Remove old backups, keeping only the MAX_BACKUPS most recent ones
@@ -37,11 +185,10 @@ def rotate_backups():
             return
         
         # Get all backup files sorted by modification time (newest first)
-        backup_files = []
-        for filename in os.listdir(BACKUP_DIR):
-            if filename.startswith('modeldb_') and filename.endswith('.json'):
-                filepath = os.path.join(BACKUP_DIR, filename)
-                backup_files.append((filepath, os.path.getmtime(filepath)))
+        backup_files = [
+            (entry.path, entry.stat().st_mtime)
+            for entry in _scan_backups()
+        ]
         
         # Sort by modification time (newest first)
         backup_files.sort(key=lambda x: x[1], reverse=True)
@@ -51,47 +198,124 @@ def rotate_backups():
             for filepath, _ in backup_files[MAX_BACKUPS:]:
                 try:
                     os.remove(filepath)
-                    print(f"🗑️  Removed old backup: {os.path.basename(filepath)}")
+                    logger.debug("🗑️  Removed old backup: %s", os.path.basename(filepath))
                 except Exception as e:
-                    print(f"⚠️  Failed to remove backup {filepath}: {e}")
+                    logger.warning("⚠️  Failed to remove backup %s: %s", filepath, e)
     
     except Exception as e:
-        print(f"⚠️  Error during backup rotation: {e}")
+        logger.warning("⚠️  Error during backup rotation: %s", e)
+
+
+def save_db(data, defer=False):
+    """
+    Save database to JSON file with automatic backup rotation
+    
+    Args:
+        data: Database dictionary
+        defer: Hold the write until flush_db() instead of writing now.
+            Always the case inside this thread's batch_saves().
+    
+    Returns:
+        True if saved (or deferred), False on error
+    """
+    if defer or _batch.depth > 0:
+        _batch.pending = data
+        return True
+    
+    # A direct save supersedes anything still waiting
+    _batch.pending = None
+    return _write_db(data)
+
+
+def flush_db():
+    """
+    Write out this thread's deferred save, if any
+    
+    Returns:
+        True if nothing was pending or the write succeeded, False on error
+    """
+    data = _batch.pending
+    _batch.pending = None
+    if data is None:
+        return True
+    return _write_db(data)
 
 
-def save_db(data):
-    """Save database to JSON file with automatic backup rotation"""
+@contextmanager
+def batch_saves():
+    """
+    Collapse every save_db() inside the block into a single write at the end
+    
+    A scrape loads, edits and saves the database several times (scraped
+    data, version links, newer-version flags, media audit). Each save is a
+    full JSON dump plus a backup, so inside this block save_db() only keeps
+    the latest database in memory and load_db() hands it back. Nests;
+    the outermost block does the write.
+    
+    The batch only covers the calling thread - saves and loads on other
+    threads go straight to the file.
+    """
+    _batch.depth += 1
     try:
-        # Ensure backup directory exists
-        os.makedirs(BACKUP_DIR, exist_ok=True)
-        
-        # Create backup before saving (if database exists)
-        if os.path.exists(DB_FILE):
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            backup_filename = f"modeldb_{timestamp}.json"
-            backup_path = os.path.join(BACKUP_DIR, backup_filename)
+        yield
+    finally:
+        _batch.depth -= 1
+        if _batch.depth == 0:
+            flush_db()
+
+
+def _write_db(data):
+    """Write database to disk, backing up the previous file first"""
+    with _write_lock:
+        try:
+            # In-memory lookup indexes are never persisted
+            if INDEX_KEY in data:
+                data = {key: value for key, value in data.items() if key != INDEX_KEY}
             
-            # Copy current database to backup
-            with open(DB_FILE, 'r', encoding='utf-8') as f:
-                backup_data = f.read()
-            with open(backup_path, 'w', encoding='utf-8') as f:
-                f.write(backup_data)
+            # Serialize first - if this fails, nothing on disk is touched
+            encoded = _encode_db(data)
             
-            print(f"✅ Created backup: db/backups/{backup_filename}")
+            # Ensure backup directory exists
+            os.makedirs(BACKUP_DIR, exist_ok=True)
             
-            # Rotate old backups
-            rotate_backups()
-        
-        # Save new data
-        with open(DB_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+            # Create backup before saving (if database exists and changed since the last backup)
+            current_hash = _file_hash(DB_FILE) if os.path.exists(DB_FILE) else None
+            if current_hash and current_hash == _read_last_backup_hash():
+                logger.debug("ℹ️  Database unchanged since last backup - skipping backup")
+            elif current_hash:
+                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                backup_filename = f"modeldb_{timestamp}.json"
+                
+                if zstandard is not None:
+                    # Compressed backup, streamed from the database file
+                    backup_filename += ZSTD_SUFFIX
+                    backup_path = os.path.join(BACKUP_DIR, backup_filename)
+                    with open(DB_FILE, 'rb') as src, open(backup_path, 'wb') as dst:
+                        zstandard.ZstdCompressor(level=3).copy_stream(src, dst)
+                else:
+                    # Copy current database to backup (kernel-side copy, no full read into memory)
+                    backup_path = os.path.join(BACKUP_DIR, backup_filename)
+                    shutil.copyfile(DB_FILE, backup_path)
+                
+                logger.debug("✅ Created backup: db/backups/%s", backup_filename)
+                _write_last_backup_hash(current_hash)
+                
+                # Rotate old backups
+                rotate_backups()
+            
+            # Save new data - write a temp file and swap it in, so a crash
+            # mid-write never leaves a truncated database behind
+            temp_file = DB_FILE + '.tmp'
+            with open(temp_file, 'wb') as f:
+                f.write(encoded)
+            os.replace(temp_file, DB_FILE)
+            
+            logger.debug("✅ Saved database: %d models", len(data.get('models', {})))
+            return True
         
-        print(f"✅ Saved database: {len(data.get('models', {}))} models")
-        return True
-    
-    except Exception as e:
-        print(f"❌ Error saving database: {e}")
-        return False
+        except Exception as e:
+            logger.error("❌ Error saving database: %s", e)
+            return False
 
 
 def get_backup_info():
@@ -106,23 +330,21 @@ def get_backup_info():
             return []
         
         backups = []
-        for filename in os.listdir(BACKUP_DIR):
-            if filename.startswith('modeldb_') and filename.endswith('.json'):
-                filepath = os.path.join(BACKUP_DIR, filename)
-                stat = os.stat(filepath)
-                backups.append({
-                    'filename': filename,
-                    'size': stat.st_size,
-                    'timestamp': datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
-                    'mtime': stat.st_mtime
-                })
+        for entry in _scan_backups():
+            stat = entry.stat()
+            backups.append({
+                'filename': entry.name,
+                'size': stat.st_size,
+                'timestamp': datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
+                'mtime': stat.st_mtime
+            })
         
         # Sort by modification time (newest first)
         backups.sort(key=lambda x: x['mtime'], reverse=True)
         return backups
     
     except Exception as e:
-        print(f"⚠️  Error getting backup info: {e}")
+        logger.warning("⚠️  Error getting backup info: %s", e)
         return []
 
 
@@ -140,27 +362,31 @@ def restore_from_backup(backup_filename):
         backup_path = os.path.join(BACKUP_DIR, backup_filename)
         
         if not os.path.exists(backup_path):
-            print(f"❌ Backup file not found: {backup_filename}")
+            logger.error("❌ Backup file not found: %s", backup_filename)
             return False
         
         # Create a safety backup of current database before restoring
         if os.path.exists(DB_FILE):
             safety_backup = os.path.join(BACKUP_DIR, f"modeldb_pre_restore_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
-            with open(DB_FILE, 'r', encoding='utf-8') as f:
-                safety_data = f.read()
-            with open(safety_backup, 'w', encoding='utf-8') as f:
-                f.write(safety_data)
-            print(f"✅ Created safety backup: {os.path.basename(safety_backup)}")
+            shutil.copyfile(DB_FILE, safety_backup)
+            logger.info("✅ Created safety backup: %s", os.path.basename(safety_backup))
         
-        # Restore from backup
-        with open(backup_path, 'r', encoding='utf-8') as f:
-            backup_data = f.read()
-        with open(DB_FILE, 'w', encoding='utf-8') as f:
-            f.write(backup_data)
+        # Restore from backup - copy next to the database and swap it in
+        temp_file = DB_FILE + '.tmp'
+        with _write_lock:
+            if backup_filename.endswith(ZSTD_SUFFIX):
+                if zstandard is None:
+                    logger.error("❌ Backup is zstd-compressed but zstandard is not installed: %s", backup_filename)
+                    return False
+                with open(backup_path, 'rb') as src, open(temp_file, 'wb') as dst:
+                    zstandard.ZstdDecompressor().copy_stream(src, dst)
+            else:
+                shutil.copyfile(backup_path, temp_file)
+            os.replace(temp_file, DB_FILE)
         
-        print(f"✅ Restored database from: {backup_filename}")
+        logger.info("✅ Restored database from: %s", backup_filename)
         return True
     
     except Exception as e:
-        print(f"❌ Error restoring from backup: {e}")
+        logger.error("❌ Error restoring from backup: %s", e)
         return False
\ No newline at end of file
@@ -0,0 +1,28 @@
+"""
+Per-thread HTTP sessions for the services that call external sites
+
+The CivArchive and CivitAI services are process-wide singletons used at
+once by Flask request threads, the background scraper and the healing
+prefetch worker. requests doesn't promise a Session is thread-safe, and
+its cookie jar changes on every response, so sessions are not shared
+between threads. Each thread keeps one Session for its lifetime instead,
+which still reuses keep-alive connections across that thread's requests
+(a whole healing batch or background scrape runs on one thread).
+"""
+import threading
+import requests
+
+_local = threading.local()
+
+
+def get_session():
+    """
+    Get the calling thread's requests.Session, creating it on first use
+    
+    Returns:
+        requests.Session owned by the current thread
+    """
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = _local.session = requests.Session()
+    return session
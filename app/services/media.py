@@ -3,6 +3,7 @@ Media file handling operations
 """
 import os
 import hashlib
+import shutil
 from config import IMAGES_DIR, ALLOWED_EXTENSIONS
 
 
@@ -20,17 +21,28 @@ def validate_file(filename):
     return ext in ALLOWED_EXTENSIONS, ext
 
 
+# Read size for streamed hashing/copying
+_CHUNK_SIZE = 1024 * 1024
+
+
 def generate_file_hash(file_content):
     """
     Generate SHA256 hash for file content
     
     Args:
-        file_content: Binary content of the file
+        file_content: Binary content of the file, or a binary file-like
+            object (hashed in chunks from its current position)
         
     Returns:
         First 16 characters of the hash
     """
-    return hashlib.sha256(file_content).hexdigest()[:16]
+    if not hasattr(file_content, 'read'):
+        return hashlib.sha256(file_content).hexdigest()[:16]
+    
+    hasher = hashlib.sha256()
+    while chunk := file_content.read(_CHUNK_SIZE):
+        hasher.update(chunk)
+    return hasher.hexdigest()[:16]
 
 
 def save_uploaded_file(file_content, original_filename, model_hash_prefix=None, rating='pg', number='001'):
@@ -43,7 +55,8 @@ def save_uploaded_file(file_content, original_filename, model_hash_prefix=None,
     Falls back to content hash if model_hash_prefix not provided.
     
     Args:
-        file_content: Binary content of the file
+        file_content: Binary content of the file, or a seekable binary
+            file-like object (streamed to disk without loading it into memory)
         original_filename: Original filename with extension
         model_hash_prefix: First 8 chars of model's hash (optional)
         rating: Content rating (pg, r, x) - default 'pg'
@@ -60,6 +73,8 @@ def save_uploaded_file(file_content, original_filename, model_hash_prefix=None,
         # If no model hash provided, fall back to content hash (legacy behavior)
         if not model_hash_prefix:
             file_hash = generate_file_hash(file_content)
+            if hasattr(file_content, 'seek'):
+                file_content.seek(0)
             filename = f"{file_hash}{ext}"
         else:
             # Use standardized naming: [Hash8]-[rating]-[img/vid]-[#].ext
@@ -70,7 +85,10 @@ def save_uploaded_file(file_content, original_filename, model_hash_prefix=None,
         # Save file
         file_path = os.path.join(IMAGES_DIR, filename)
         with open(file_path, 'wb') as f:
-            f.write(file_content)
+            if hasattr(file_content, 'read'):
+                shutil.copyfileobj(file_content, f, _CHUNK_SIZE)
+            else:
+                f.write(file_content)
         
         return filename
     except Exception as e:
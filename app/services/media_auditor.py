@@ -14,8 +14,40 @@ import os
 import re
 import json
 import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
 from app.services.database import load_db, save_db
-from config import IMAGES_DIR
+from app.services.model_index import ensure_indexes
+from app.services.console_log import get_logger
+from config import IMAGES_DIR, VIDEO_PROBE_CACHE_FILE
+
+logger = get_logger(__name__)
+
+
+# Standardized media filename: 8 hex chars - rating - img/vid - number . extension
+# Compiled once - parse_media_filename runs for every file in every audit
+_MEDIA_RE = re.compile(r'^([a-f0-9]{8})-([a-z]+)-(img|vid)-(\d+)(\..+)$', re.IGNORECASE)
+
+# Extensions treated as video
+_VIDEO_EXTS = frozenset({'.mp4', '.webm'})
+
+# Media type part of a standard filename by lowercased extension (anything
+# else is 'img')
+_EXT_TO_MEDIA_TYPE = dict.fromkeys(_VIDEO_EXTS, 'vid')
+
+# Renames relative to an open directory handle (not available on Windows)
+_DIR_FD_RENAME = os.rename in os.supports_dir_fd and os.access in os.supports_dir_fd
+
+# Hardware H.264 encoders in order of preference, with settings roughly
+# matching libx264 at CRF 23
+_HW_H264_ENCODERS = [
+    ('h264_nvenc', ['-preset', 'p5', '-cq', '23']),               # NVIDIA
+    ('h264_qsv', ['-preset', 'medium', '-global_quality', '23']),  # Intel Quick Sync
+    ('h264_videotoolbox', ['-q:v', '60']),                        # macOS
+]
+_SW_H264_ENCODER = ('libx264', ['-preset', 'medium', '-crf', '23'])
 
 
 def check_video_compatibility(video_path):
@@ -30,23 +62,29 @@ def check_video_compatibility(video_path):
         Dict with keys: compatible (bool), issues (list), pix_fmt (str), codec (str)
     """
     try:
-        # Use ffprobe to analyze video
+        # Use ffprobe to analyze video - only the three fields checked below,
+        # as key=value lines rather than every stream property as JSON
         cmd = [
-            'ffprobe', '-v', 'quiet', '-print_format', 'json',
-            '-show_streams', '-select_streams', 'v:0',
+            'ffprobe', '-v', 'quiet', '-select_streams', 'v:0',
+            '-show_entries', 'stream=codec_name,profile,pix_fmt',
+            '-of', 'default=noprint_wrappers=1',
             video_path
         ]
         
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
+        # -v quiet leaves nothing on stderr
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=10)
         
         if result.returncode != 0:
             return {'compatible': False, 'issues': ['Failed to analyze video'], 'pix_fmt': None, 'codec': None}
         
-        data = json.loads(result.stdout)
-        if not data.get('streams'):
+        stream = {}
+        for line in result.stdout.decode('utf-8', errors='replace').splitlines():
+            key, sep, value = line.partition('=')
+            if sep:
+                stream[key] = value
+        if not stream:
             return {'compatible': False, 'issues': ['No video stream found'], 'pix_fmt': None, 'codec': None}
         
-        stream = data['streams'][0]
         pix_fmt = stream.get('pix_fmt', '')
         codec = stream.get('codec_name', '')
         profile = stream.get('profile', '')
@@ -84,6 +122,176 @@ def check_video_compatibility(video_path):
         return {'compatible': False, 'issues': [f'Analysis error: {str(e)}'], 'pix_fmt': None, 'codec': None}
 
 
+def probe_videos(video_paths, cache=None):
+    """
+    Run check_video_compatibility over many videos concurrently
+    
+    Each probe is an ffprobe subprocess that mostly waits on disk, so a
+    thread pool overlaps them and the batch takes about as long as the
+    slowest probe instead of the sum of all of them.
+    
+    Args:
+        video_paths: List of full paths to video files
+        cache: Probe cache from load_probe_cache() (optional). Videos whose
+            mtime and size match their entry aren't probed again; entries
+            for newly probed videos are added or replaced in place.
+        
+    Returns:
+        Dict of {video_path: compatibility result}
+    """
+    results = {}
+    to_probe = []
+    file_keys = {}
+    
+    for video_path in video_paths:
+        if cache is not None:
+            try:
+                st = os.stat(video_path)
+            except OSError:
+                to_probe.append(video_path)
+                continue
+            
+            file_keys[video_path] = (st.st_mtime_ns, st.st_size)
+            cached = cache.get(video_path)
+            if cached and (cached['mtime_ns'], cached['size']) == file_keys[video_path]:
+                results[video_path] = cached['result']
+                continue
+        
+        to_probe.append(video_path)
+    
+    if not to_probe:
+        return results
+    
+    max_workers = min(len(to_probe), (os.cpu_count() or 1) * 2)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for video_path, result in zip(to_probe, executor.map(check_video_compatibility, to_probe)):
+            results[video_path] = result
+            
+            # Only cache real analyses - not timeouts or a missing ffprobe
+            if video_path in file_keys and result['pix_fmt'] is not None:
+                mtime_ns, size = file_keys[video_path]
+                cache[video_path] = {'mtime_ns': mtime_ns, 'size': size, 'result': result}
+    
+    return results
+
+
+def load_probe_cache():
+    """
+    Load cached ffprobe results
+    
+    Returns:
+        Dict of {video_path: {mtime_ns, size, result}} (empty if there is
+        no cache yet or it can't be read)
+    """
+    try:
+        with open(VIDEO_PROBE_CACHE_FILE, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        return cache if isinstance(cache, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_probe_cache(cache):
+    """
+    Write cached ffprobe results atomically
+    
+    Args:
+        cache: Dict of {video_path: {mtime_ns, size, result}}
+    """
+    try:
+        os.makedirs(os.path.dirname(VIDEO_PROBE_CACHE_FILE), exist_ok=True)
+        temp_file = VIDEO_PROBE_CACHE_FILE + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+        os.replace(temp_file, VIDEO_PROBE_CACHE_FILE)
+    except OSError as e:
+        logger.warning("   ⚠️  Could not save video probe cache: %s", e)
+
+
+@lru_cache(maxsize=None)
+def get_h264_encoder():
+    """
+    Pick the fastest H.264 encoder that actually works on this machine
+    
+    Checked once per process. Stock ffmpeg builds list hardware encoders
+    whether or not the matching GPU is present, so each listed one gets a
+    one-frame test encode before it is chosen. Falls back to libx264 if
+    none of them works (or ffmpeg can't be run at all).
+    
+    Returns:
+        (encoder name, encoder-specific ffmpeg args) tuple
+    """
+    try:
+        result = subprocess.run(['ffmpeg', '-hide_banner', '-encoders'],
+                                capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return _SW_H264_ENCODER
+    
+    # Lines look like " V....D h264_nvenc    NVIDIA NVENC H.264 encoder"
+    available = {line.split()[1] for line in result.stdout.splitlines() if len(line.split()) > 1}
+    
+    for encoder in _HW_H264_ENCODERS:
+        if encoder[0] in available and _can_encode(*encoder):
+            return encoder
+    return _SW_H264_ENCODER
+
+
+def _can_encode(encoder, encoder_args):
+    """Whether a one-frame test encode with this encoder succeeds"""
+    cmd = ['ffmpeg', '-hide_banner', '-nostats',
+           '-f', 'lavfi', '-i', 'nullsrc=s=256x256',
+           '-frames:v', '1', '-pix_fmt', 'yuv420p',
+           '-c:v', encoder, *encoder_args,
+           '-f', 'null', '-']
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=15)
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+    return result.returncode == 0
+
+
+def _reencode_cmd(video_path, temp_output, encoder, encoder_args):
+    """Build the ffmpeg command re-encoding a video to YUV420p H.264"""
+    cmd = ['ffmpeg', '-hide_banner', '-nostats']
+    if encoder != _SW_H264_ENCODER[0]:
+        # Decode on the GPU too where possible
+        cmd += ['-hwaccel', 'auto']
+    
+    return cmd + [
+        '-i', video_path,
+        '-pix_fmt', 'yuv420p',
+        '-c:v', encoder,
+        *encoder_args,
+        '-profile:v', 'high',  # Use High profile (widely supported), not High 4:4:4
+        '-level', '4.1',
+        '-c:a', 'aac',
+        '-b:a', '128k',
+        '-movflags', '+faststart',
+        '-y',  # Overwrite output
+        temp_output
+    ]
+
+
+def _run_ffmpeg(cmd, timeout):
+    """
+    Run ffmpeg, keeping only the tail of its log
+    
+    stderr goes to a temporary file rather than a pipe, so a long encode's
+    log never builds up in memory as one big string.
+    
+    Returns:
+        (returncode, last 4 KB of stderr as text - empty on success) tuple
+    """
+    with tempfile.TemporaryFile() as log_file:
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=log_file, timeout=timeout)
+        if result.returncode == 0:
+            return 0, ''
+        
+        size = log_file.seek(0, os.SEEK_END)
+        log_file.seek(max(0, size - 4096))
+        return result.returncode, log_file.read().decode('utf-8', errors='replace')
+
+
 def reencode_video_to_yuv420(video_path):
     """
     Re-encode a video to YUV420p with baseline H.264 profile for maximum browser compatibility
@@ -106,31 +314,26 @@ def reencode_video_to_yuv420(video_path):
         temp_output = video_path + '.temp.mp4'
         
         # Re-encode to YUV420p with H.264 baseline profile for maximum compatibility
-        cmd = [
-            'ffmpeg', '-i', video_path,
-            '-pix_fmt', 'yuv420p',
-            '-c:v', 'libx264',
-            '-profile:v', 'high',  # Use High profile (widely supported), not High 4:4:4
-            '-level', '4.1',
-            '-preset', 'medium',
-            '-crf', '23',
-            '-c:a', 'aac',
-            '-b:a', '128k',
-            '-movflags', '+faststart',
-            '-y',  # Overwrite output
-            temp_output
-        ]
+        encoder, encoder_args = get_h264_encoder()
+        cmd = _reencode_cmd(video_path, temp_output, encoder, encoder_args)
         
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+        returncode, log_tail = _run_ffmpeg(cmd, timeout=300)
         
-        if result.returncode != 0:
+        if returncode != 0 and encoder != _SW_H264_ENCODER[0]:
+            # The hardware encoder passed its test encode but can still reject
+            # a particular input (size limits, odd source formats)
+            encoder, encoder_args = _SW_H264_ENCODER
+            cmd = _reencode_cmd(video_path, temp_output, encoder, encoder_args)
+            returncode, log_tail = _run_ffmpeg(cmd, timeout=300)
+        
+        if returncode != 0:
             # Cleanup on failure
             if os.path.exists(temp_output):
                 os.remove(temp_output)
             os.remove(backup_path)
             return {
                 'success': False,
-                'message': f'Re-encoding failed: {result.stderr[:200]}',
+                'message': f'Re-encoding failed: {log_tail.strip()[-200:]}',
                 'backup_path': None
             }
         
@@ -139,7 +342,7 @@ def reencode_video_to_yuv420(video_path):
         
         return {
             'success': True,
-            'message': 'Successfully re-encoded to YUV420p',
+            'message': f'Successfully re-encoded to YUV420p ({encoder})',
             'backup_path': backup_path
         }
         
@@ -175,17 +378,24 @@ def parse_media_filename(filename):
         Dict with keys: hash_prefix, rating, media_type, number, extension
         Returns None if filename doesn't match pattern
     """
-    # Pattern: 8 hex chars - rating - img/vid - number . extension
-    pattern = r'^([a-f0-9]{8})-([a-z]+)-(img|vid)-(\d+)(\..+)$'
-    match = re.match(pattern, filename.lower())
+    # Case-insensitive match, lowercasing only the captured parts - and only
+    # when the name isn't lowercase already, as standard names are
+    match = _MEDIA_RE.match(filename)
     
     if match:
+        hash_prefix, rating, media_type, number, extension = match.groups()
+        if not filename.islower():
+            hash_prefix = hash_prefix.lower()
+            rating = rating.lower()
+            media_type = media_type.lower()
+            extension = extension.lower()
+        
         return {
-            'hash_prefix': match.group(1),
-            'rating': match.group(2),
-            'media_type': match.group(3),
-            'number': match.group(4),
-            'extension': match.group(5)
+            'hash_prefix': hash_prefix,
+            'rating': rating,
+            'media_type': media_type,
+            'number': number,
+            'extension': extension
         }
     return None
 
@@ -210,6 +420,8 @@ def find_model_by_hash_prefix(db, hash_prefix):
     """
     Find model in database that matches the given hash prefix
     
+    Uses the prefix index, so repeated lookups don't rescan every model.
+    
     Args:
         db: Database dictionary
         hash_prefix: First 8 characters of model hash
@@ -217,46 +429,143 @@ def find_model_by_hash_prefix(db, hash_prefix):
     Returns:
         (model_path, model) tuple if found, (None, None) otherwise
     """
-    for model_path, model in db['models'].items():
-        model_hash_prefix = get_model_hash_prefix(model)
-        if model_hash_prefix == hash_prefix.lower():
-            return model_path, model
+    bucket = ensure_indexes(db)['media_prefixes'].get(hash_prefix.lower())
+    if bucket:
+        # First match in database order, as a linear scan would find
+        _, model_path, model, _ = bucket[0]
+        return model_path, model
     return None, None
 
 
-def rename_media_file(old_filename, new_filename):
+def scan_media_dir():
+    """
+    List and index the images directory in a single os.scandir pass
+    
+    Every filename is parsed once here, so an audit over all models costs one
+    directory listing instead of one per model. DirEntry objects carry the
+    file type from the listing itself, so checking them needs no extra stat.
+    
+    Returns:
+        Dict with keys (empty/False if the directory doesn't exist):
+        - 'filenames': set of every name in the directory
+        - 'by_prefix': {hash_prefix: {filename: parsed}} for regular files in
+          the standard naming format, in directory order
+        - 'case_sensitive': True if the directory is known to be on a
+          case-sensitive filesystem, so a name missing from 'filenames'
+          doesn't exist under any spelling
+    """
+    media_scan = {'filenames': set(), 'by_prefix': {}, 'case_sensitive': False}
+    
+    try:
+        with os.scandir(IMAGES_DIR) as entries:
+            for entry in entries:
+                media_scan['filenames'].add(entry.name)
+                
+                parsed = parse_media_filename(entry.name)
+                if parsed and entry.is_file():
+                    media_scan['by_prefix'].setdefault(parsed['hash_prefix'], {})[entry.name] = parsed
+    except FileNotFoundError:
+        pass
+    
+    media_scan['case_sensitive'] = _is_case_sensitive(media_scan['filenames'])
+    return media_scan
+
+
+def _is_case_sensitive(filenames):
+    """
+    Check whether the images directory tells names apart by case
+    
+    Looks up one listed name with its case swapped - at most one stat per
+    scan. Without a name to try (empty directory, no cased names) this
+    can't be known, so the answer is False.
+    """
+    for name in filenames:
+        swapped = name.swapcase()
+        if swapped != name and swapped not in filenames:
+            return not os.path.exists(IMAGES_DIR + os.sep + swapped)
+    return False
+
+
+def _track_rename(media_scan, old_filename, new_filename):
+    """Keep a directory scan in step with a file renamed after it was taken"""
+    media_scan['filenames'].discard(old_filename)
+    media_scan['filenames'].add(new_filename)
+    
+    parsed = parse_media_filename(old_filename)
+    if parsed:
+        media_scan['by_prefix'].get(parsed['hash_prefix'], {}).pop(old_filename, None)
+    
+    parsed = parse_media_filename(new_filename)
+    if parsed and os.path.isfile(IMAGES_DIR + os.sep + new_filename):
+        media_scan['by_prefix'].setdefault(parsed['hash_prefix'], {})[new_filename] = parsed
+
+
+@contextmanager
+def media_dir_fd():
+    """
+    Open the images directory once for a batch of renames
+    
+    Yields:
+        Directory file descriptor for rename_media_file, or None where
+        dir_fd operations aren't supported or the directory doesn't exist
+    """
+    if not _DIR_FD_RENAME or not os.path.isdir(IMAGES_DIR):
+        yield None
+        return
+    
+    dir_fd = os.open(IMAGES_DIR, os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0))
+    try:
+        yield dir_fd
+    finally:
+        os.close(dir_fd)
+
+
+def rename_media_file(old_filename, new_filename, dir_fd=None, existing_names=None):
     """
     Rename a media file on disk
     
     Args:
         old_filename: Current filename
         new_filename: New standardized filename
+        dir_fd: Images directory handle from media_dir_fd() (optional) -
+            filenames are then resolved from it instead of from the full path
+        existing_names: Every name in the images directory, from a scan on a
+            case-sensitive filesystem (optional) - the target is then checked
+            against it instead of on disk. The caller keeps it up to date.
         
     Returns:
         True if successful, False otherwise
     """
     try:
-        old_path = os.path.join(IMAGES_DIR, old_filename)
-        new_path = os.path.join(IMAGES_DIR, new_filename)
-        
         # Don't rename if already correct
         if old_filename == new_filename:
             return True
         
         # Don't rename if target already exists
-        if os.path.exists(new_path):
-            print(f"   ⚠️  Cannot rename {old_filename} - {new_filename} already exists")
+        if existing_names is not None:
+            exists = new_filename in existing_names
+        elif dir_fd is not None:
+            exists = os.access(new_filename, os.F_OK, dir_fd=dir_fd)
+        else:
+            exists = os.path.exists(os.path.join(IMAGES_DIR, new_filename))
+        
+        if exists:
+            logger.warning("   ⚠️  Cannot rename %s - %s already exists", old_filename, new_filename)
             return False
         
         # Rename the file
-        os.rename(old_path, new_path)
+        if dir_fd is not None:
+            os.rename(old_filename, new_filename, src_dir_fd=dir_fd, dst_dir_fd=dir_fd)
+        else:
+            os.rename(os.path.join(IMAGES_DIR, old_filename), os.path.join(IMAGES_DIR, new_filename))
         return True
     except Exception as e:
-        print(f"   ❌ Failed to rename {old_filename}: {e}")
+        logger.error("   ❌ Failed to rename %s: %s", old_filename, e)
         return False
 
 
-def audit_media_for_model(db, model_path, model, reencode_videos=True):
+def audit_media_for_model(db, model_path, model, reencode_videos=True, media_scan=None, video_checks=None,
+                          dir_fd=None):
     """
     Audit media files for a specific model
     Removes invalid references, adds missing media, renames to standard format,
@@ -267,6 +576,11 @@ def audit_media_for_model(db, model_path, model, reencode_videos=True):
         model_path: Path to the model
         model: Model dictionary
         reencode_videos: Whether to re-encode incompatible videos (default: True)
+        media_scan: Directory scan from scan_media_dir() to reuse across models
+            (default: scan the directory for this model alone)
+        video_checks: Results from probe_videos() to use instead of probing
+            here; each is used once, then the video is probed again
+        dir_fd: Images directory handle from media_dir_fd() for renames
         
     Returns:
         Dict with stats: removed, added, verified, renamed, reencoded, video_errors
@@ -282,39 +596,61 @@ def audit_media_for_model(db, model_path, model, reencode_videos=True):
     if not isinstance(existing_media, list):
         existing_media = []
     
-    # Verify and rename each existing media file
+    # Messages are written once per model rather than line by line
+    log_lines = []
+    
+    if media_scan is None:
+        media_scan = scan_media_dir()
+    media_files = media_scan['filenames']
+    # Rename targets can be checked against the listing only where case
+    # can't hide an existing file
+    existing_names = media_files if media_scan.get('case_sensitive') else None
+    images_prefix = IMAGES_DIR + os.sep
+    
+    # Verify each existing media file and rename it to the standard format
     verified_media = []
     media_counter = {}  # Track counters for each rating/type combo
     
     for media_item in existing_media:
         filename = media_item['filename']
-        file_path = os.path.join(IMAGES_DIR, filename)
-        
-        if not os.path.exists(file_path):
-            print(f"   🗑️  Removed missing reference: {filename}")
+        file_path = images_prefix + filename
+        
+        # Only names missing from the listing need a real check (subfolders,
+        # case-insensitive filesystems). Renames below keep the listing current,
+        # so a file renamed for an earlier reference is gone by now and a
+        # rename's target is present.
+        if filename not in media_files and not os.path.exists(file_path):
+            log_lines.append(f"   🗑️  Removed missing reference: {filename}")
             stats['removed'] += 1
             continue
         
         # Check video compatibility if it's a video file
         ext = os.path.splitext(filename)[1].lower()
-        if reencode_videos and ext in ['.mp4', '.webm']:
-            compat = check_video_compatibility(file_path)
+        media_type = _EXT_TO_MEDIA_TYPE.get(ext, 'img')
+        if reencode_videos and media_type == 'vid':
+            compat = video_checks.pop(file_path, None) if video_checks else None
+            if compat is None:
+                compat = check_video_compatibility(file_path)
             
             if not compat['compatible']:
-                print(f"   ⚠️  Incompatible video detected: {filename}")
+                log_lines.append(f"   ⚠️  Incompatible video detected: {filename}")
                 for issue in compat['issues']:
-                    print(f"      - {issue}")
+                    log_lines.append(f"      - {issue}")
                 
                 if 'YUV444' in ' '.join(compat['issues']) or '444' in compat.get('pix_fmt', '') or '4:4:4' in compat.get('profile', ''):
-                    print(f"   🔄 Re-encoding to compatible format...")
+                    log_lines.append(f"   🔄 Re-encoding to compatible format...")
+                    
+                    # Show what's happening before a re-encode that can take minutes
+                    logger.info('\n'.join(log_lines))
+                    log_lines.clear()
                     result = reencode_video_to_yuv420(file_path)
                     
                     if result['success']:
-                        print(f"   ✅ {result['message']}")
-                        print(f"      Backup: {result['backup_path']}")
+                        log_lines.append(f"   ✅ {result['message']}")
+                        log_lines.append(f"      Backup: {result['backup_path']}")
                         stats['reencoded'] += 1
                     else:
-                        print(f"   ❌ {result['message']}")
+                        log_lines.append(f"   ❌ {result['message']}")
                         stats['video_errors'] += 1
         
         # Check if filename matches standard format
@@ -323,8 +659,6 @@ def audit_media_for_model(db, model_path, model, reencode_videos=True):
         if not parsed or parsed['hash_prefix'] != model_hash_prefix:
             # File needs to be renamed to standard format
             rating = media_item.get('rating', 'pg')
-            ext = os.path.splitext(filename)[1].lower()
-            media_type = 'vid' if ext in ['.mp4', '.webm'] else 'img'
             
             # Get next number for this rating/type combo
             key = f"{rating}-{media_type}"
@@ -336,14 +670,12 @@ def audit_media_for_model(db, model_path, model, reencode_videos=True):
             number = f"{media_counter[key]:03d}"
             new_filename = generate_standard_filename(model_hash_prefix, rating, ext, number)
             
-            # Rename the file
-            if rename_media_file(filename, new_filename):
-                print(f"   📝 Renamed: {filename} -> {new_filename}")
+            if rename_media_file(filename, new_filename, dir_fd=dir_fd, existing_names=existing_names):
+                log_lines.append(f"   📝 Renamed: {filename} -> {new_filename}")
+                _track_rename(media_scan, filename, new_filename)
                 media_item['filename'] = new_filename
                 stats['renamed'] += 1
-            else:
-                # Keep old filename if rename failed
-                pass
+            # Keep old filename if rename failed
         else:
             # File already has standard format
             # Update counter to avoid duplicates
@@ -357,39 +689,66 @@ def audit_media_for_model(db, model_path, model, reencode_videos=True):
         verified_media.append(media_item)
         stats['verified'] += 1
     
-    # Scan images directory for files matching this model's hash
-    if os.path.exists(IMAGES_DIR):
-        existing_filenames = {item['filename'] for item in verified_media}
+    # Re-associate files named with this model's hash that aren't referenced yet
+    existing_filenames = {item['filename'] for item in verified_media}
+    
+    for filename, parsed in media_scan['by_prefix'].get(model_hash_prefix, {}).items():
+        # Skip if already referenced
+        if filename in existing_filenames:
+            continue
         
-        for filename in os.listdir(IMAGES_DIR):
-            # Skip if already referenced
-            if filename in existing_filenames:
-                continue
-            
-            # Try to parse filename
-            parsed = parse_media_filename(filename)
-            if not parsed:
-                continue
-            
-            # Check if hash matches this model
-            if parsed['hash_prefix'] == model_hash_prefix:
-                file_path = os.path.join(IMAGES_DIR, filename)
-                if os.path.isfile(file_path):
-                    # Add this media to the model
-                    verified_media.append({
-                        'filename': filename,
-                        'rating': parsed['rating'],
-                        'caption': f'Auto-recovered from filename'
-                    })
-                    print(f"   ✅ Re-associated: {filename}")
-                    stats['added'] += 1
+        # Add this media to the model
+        verified_media.append({
+            'filename': filename,
+            'rating': parsed['rating'],
+            'caption': f'Auto-recovered from filename'
+        })
+        log_lines.append(f"   ✅ Re-associated: {filename}")
+        stats['added'] += 1
     
     # Update model's media list
     model['exampleImages'] = verified_media
     
+    if log_lines:
+        logger.info('\n'.join(log_lines))
+    
     return stats
 
 
+def collect_video_paths(db, media_scan):
+    """
+    List the full path of every existing video the audit will check
+    
+    Args:
+        db: Database dictionary
+        media_scan: Directory scan from scan_media_dir()
+        
+    Returns:
+        List of unique video paths, in audit order
+    """
+    video_paths = {}
+    images_prefix = IMAGES_DIR + os.sep
+    
+    for model in db['models'].values():
+        if not get_model_hash_prefix(model):
+            continue
+        
+        existing_media = model.get('exampleImages', [])
+        if not isinstance(existing_media, list):
+            continue
+        
+        for media_item in existing_media:
+            filename = media_item['filename']
+            if os.path.splitext(filename)[1].lower() not in _EXT_TO_MEDIA_TYPE:
+                continue
+            
+            file_path = images_prefix + filename
+            if filename in media_scan['filenames'] or os.path.exists(file_path):
+                video_paths[file_path] = None
+    
+    return list(video_paths)
+
+
 def audit_all_media(db, reencode_videos=True):
     """
     Audit all media files across all models
@@ -406,8 +765,8 @@ def audit_all_media(db, reencode_videos=True):
     Returns:
         Dict with overall stats and per-model details
     """
-    print("\n🔍 === MEDIA AUDIT START ===")
-    print(f"   Video re-encoding: {'ENABLED' if reencode_videos else 'DISABLED'}")
+    logger.info("\n🔍 === MEDIA AUDIT START ===\n   Video re-encoding: %s",
+                'ENABLED' if reencode_videos else 'DISABLED')
     
     overall_stats = {
         'models_audited': 0,
@@ -421,40 +780,64 @@ def audit_all_media(db, reencode_videos=True):
     
     model_details = []
     
-    # Audit each model
-    for model_path, model in db['models'].items():
-        model_hash_prefix = get_model_hash_prefix(model)
-        if not model_hash_prefix:
-            continue
-        
-        model_stats = audit_media_for_model(db, model_path, model, reencode_videos=reencode_videos)
-        
-        overall_stats['models_audited'] += 1
-        overall_stats['media_verified'] += model_stats['verified']
-        overall_stats['references_removed'] += model_stats['removed']
-        overall_stats['media_re_associated'] += model_stats['added']
-        overall_stats['media_renamed'] += model_stats['renamed']
-        overall_stats['videos_reencoded'] += model_stats['reencoded']
-        overall_stats['video_errors'] += model_stats['video_errors']
-        
-        if model_stats['removed'] > 0 or model_stats['added'] > 0 or model_stats['renamed'] > 0 or model_stats['reencoded'] > 0:
-            model_details.append({
-                'path': model_path,
-                'name': model.get('name', 'Unknown'),
-                'stats': model_stats
-            })
-            print(f"📦 {model.get('name', 'Unknown')}: verified={model_stats['verified']}, removed={model_stats['removed']}, added={model_stats['added']}, renamed={model_stats['renamed']}, reencoded={model_stats['reencoded']}")
-    
-    print(f"\n✅ Audit complete:")
-    print(f"   Models audited: {overall_stats['models_audited']}")
-    print(f"   Media verified: {overall_stats['media_verified']}")
-    print(f"   References removed: {overall_stats['references_removed']}")
-    print(f"   Media re-associated: {overall_stats['media_re_associated']}")
-    print(f"   Media renamed: {overall_stats['media_renamed']}")
-    print(f"   Videos re-encoded: {overall_stats['videos_reencoded']}")
+    # List the directory once and share it across every model
+    media_scan = scan_media_dir()
+    
+    # Probe every referenced video up front, concurrently
+    video_checks = None
+    if reencode_videos:
+        video_paths = collect_video_paths(db, media_scan)
+        if video_paths:
+            logger.info("   Videos to check: %d", len(video_paths))
+        
+        # Unchanged videos are answered from the cache; entries for videos
+        # no longer referenced are dropped
+        probe_cache = load_probe_cache()
+        video_checks = probe_videos(video_paths, probe_cache)
+        save_probe_cache({path: probe_cache[path] for path in video_paths if path in probe_cache})
+    
+    # Audit each model, renaming relative to one open directory handle
+    with media_dir_fd() as dir_fd:
+        for model_path, model in db['models'].items():
+            model_hash_prefix = get_model_hash_prefix(model)
+            if not model_hash_prefix:
+                continue
+            
+            model_stats = audit_media_for_model(db, model_path, model, reencode_videos=reencode_videos,
+                                                media_scan=media_scan, video_checks=video_checks,
+                                                dir_fd=dir_fd)
+            
+            overall_stats['models_audited'] += 1
+            overall_stats['media_verified'] += model_stats['verified']
+            overall_stats['references_removed'] += model_stats['removed']
+            overall_stats['media_re_associated'] += model_stats['added']
+            overall_stats['media_renamed'] += model_stats['renamed']
+            overall_stats['videos_reencoded'] += model_stats['reencoded']
+            overall_stats['video_errors'] += model_stats['video_errors']
+            
+            if model_stats['removed'] > 0 or model_stats['added'] > 0 or model_stats['renamed'] > 0 or model_stats['reencoded'] > 0:
+                model_details.append({
+                    'path': model_path,
+                    'name': model.get('name', 'Unknown'),
+                    'stats': model_stats
+                })
+                logger.info("📦 %s: verified=%d, removed=%d, added=%d, renamed=%d, reencoded=%d",
+                            model.get('name', 'Unknown'), model_stats['verified'], model_stats['removed'],
+                            model_stats['added'], model_stats['renamed'], model_stats['reencoded'])
+    
+    summary = [
+        f"\n✅ Audit complete:",
+        f"   Models audited: {overall_stats['models_audited']}",
+        f"   Media verified: {overall_stats['media_verified']}",
+        f"   References removed: {overall_stats['references_removed']}",
+        f"   Media re-associated: {overall_stats['media_re_associated']}",
+        f"   Media renamed: {overall_stats['media_renamed']}",
+        f"   Videos re-encoded: {overall_stats['videos_reencoded']}"
+    ]
     if overall_stats['video_errors'] > 0:
-        print(f"   ⚠️  Video errors: {overall_stats['video_errors']}")
-    print("=== MEDIA AUDIT END ===\n")
+        summary.append(f"   ⚠️  Video errors: {overall_stats['video_errors']}")
+    summary.append("=== MEDIA AUDIT END ===\n")
+    logger.info('\n'.join(summary))
     
     return {
         'stats': overall_stats,
@@ -504,14 +887,13 @@ def generate_standard_filename(model_hash_prefix, rating, extension, number):
     Args:
         model_hash_prefix: First 8 chars of model hash
         rating: Content rating (pg, r, x)
-        extension: File extension (e.g., '.jpg', '.mp4')
+        extension: Lowercased file extension (e.g., '.jpg', '.mp4')
         number: Sequential number (e.g., "001")
         
     Returns:
         Standardized filename string
     """
     # Determine if image or video
-    ext_lower = extension.lower()
-    media_type = 'vid' if ext_lower in ['.mp4', '.webm'] else 'img'
+    media_type = _EXT_TO_MEDIA_TYPE.get(extension, 'img')
     
     return f"{model_hash_prefix}-{rating}-{media_type}-{number}{extension}"
@@ -2,120 +2,357 @@
 Metadata extraction service for AI-generated images
 Supports ComfyUI, A1111, and standard image metadata
 """
+import copy
 import os
+import re
 import json
+import mmap
+import struct
+import zlib
+from functools import lru_cache
 from PIL import Image
 from PIL.PngImagePlugin import PngInfo
 from config import IMAGES_DIR
 
+# orjson is optional - several times faster than the json module on the
+# large ComfyUI workflow graphs embedded in PNGs
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-class MetadataExtractor:
-    """Extract and parse metadata from AI-generated images"""
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# Chunk length and type, and the IHDR fields read (width, height, bit
+# depth, color type)
+_PNG_CHUNK_HEAD = struct.Struct('>I4s')
+_PNG_IHDR = struct.Struct('>IIBB')
+
+# Chunks read before the image data; the walk stops at IDAT or IEND
+_PNG_READ_CHUNKS = frozenset({b'IHDR', b'tEXt', b'zTXt', b'iTXt'})
+_PNG_STOP_CHUNKS = frozenset({b'IDAT', b'IEND'})
+
+# Image mode PIL reports for each IHDR (bit depth, color type)
+_PNG_MODES = {
+    (1, 0): '1', (2, 0): 'L', (4, 0): 'L', (8, 0): 'L', (16, 0): 'I;16',
+    (8, 2): 'RGB', (16, 2): 'RGB',
+    (1, 3): 'P', (2, 3): 'P', (4, 3): 'P', (8, 3): 'P',
+    (8, 4): 'LA', (16, 4): 'LA',
+    (8, 6): 'RGBA', (16, 6): 'RGBA',
+}
+
+_JPEG_EXTS = frozenset({'.jpg', '.jpeg'})
+
+# Image mode PIL reports for each JPEG component count
+_JPEG_MODES = {1: 'L', 3: 'RGB', 4: 'CMYK'}
+
+# JPEG start-of-frame markers (C0-CF, except DHT, JPG and DAC)
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+# Offset, count and IFD entry (tag, type, count) readers for each TIFF
+# byte order
+_TIFF_STRUCTS = {
+    b'II': (struct.Struct('<I'), struct.Struct('<H'), struct.Struct('<HHI')),
+    b'MM': (struct.Struct('>I'), struct.Struct('>H'), struct.Struct('>HHI')),
+}
+
+# TIFF types UserComment may have: BYTE, ASCII, UNDEFINED (one byte each)
+_TIFF_BYTE_TYPES = frozenset({1, 2, 7})
+
+# EXIF UserComment tag (sometimes contains generation params), and the
+# IFD0 tag pointing to the Exif sub-IFD that normally holds it
+_EXIF_USER_COMMENT = 0x9286
+_EXIF_IFD_POINTER = 0x8769
+
+# Other PNG text keys that may hold generation parameters, in priority order
+_COMMENT_KEYS = ('Comment', 'comment', 'Description', 'UserComment')
+
+# Largest decompressed text chunk accepted (guards against zlib bombs)
+_MAX_TEXT_CHUNK = 64 * 1024 * 1024
+
+# One "Key: value" pair of an A1111 parameters line - values may be quoted
+# to hold commas (e.g. Lora hashes: "a: 1, b: 2")
+_PARAM_RE = re.compile(r'([A-Za-z][\w ]*?):\s*("(?:[^"\\]|\\.)*"|[^,]*)(?:,\s*|$)')
+
+# Start of the line holding the negative prompt
+_NEGATIVE_PROMPT_RE = re.compile(r'negative prompt:', re.IGNORECASE)
+
+# Marks the parameters line that ends a multi-line negative prompt
+_PARAMS_LINE_RE = re.compile(r'steps:|sampler:|cfg scale:|seed:', re.IGNORECASE)
+
+# Result field for each (lowercased) A1111 parameter name
+_KEY_MAP = {
+    'steps': 'steps',
+    'sampler': 'sampler',
+    'sampling method': 'sampler',
+    'cfg scale': 'cfg_scale',
+    'cfg': 'cfg_scale',
+    'seed': 'seed',
+    'size': 'dimensions',
+    'resolution': 'dimensions',
+    'clip skip': 'clip_skip',
+    'clipskip': 'clip_skip',
+    'model': 'model',
+    'model hash': 'model_hash',
+    'vae': 'vae',
+}
+
+
+# CLIPTextEncode text longer than this is taken to be the positive prompt
+_LONG_PROMPT_LENGTH = 100
+
+
+def _handle_clip_text_encode(inputs, result):
+    """Extract prompts from CLIPTextEncode nodes"""
+    text = inputs.get('text', '')
+    # Heuristic: positive prompts are usually longer
+    if text:
+        if 'positive_prompt' not in result or len(text) > len(result.get('positive_prompt', '')):
+            if len(text) > _LONG_PROMPT_LENGTH:  # Likely positive prompt
+                result['positive_prompt'] = text
+            elif 'positive_prompt' not in result:
+                result['positive_prompt'] = text
+            else:
+                result['negative_prompt'] = text
+
+
+def _handle_ksampler(inputs, result):
+    """Extract sampler settings from KSampler"""
+    if 'seed' in inputs:
+        result['seed'] = str(inputs['seed'])
+    if 'steps' in inputs:
+        result['steps'] = str(inputs['steps'])
+    if 'cfg' in inputs:
+        result['cfg_scale'] = str(inputs['cfg'])
+    if 'sampler_name' in inputs:
+        result['sampler'] = inputs['sampler_name']
+    if 'scheduler' in inputs:
+        if 'sampler' in result:
+            result['sampler'] = f"{result['sampler']} {inputs['scheduler']}"
+        else:
+            result['sampler'] = inputs['scheduler']
+
+
+def _handle_checkpoint_loader(inputs, result):
+    """Extract model info from CheckpointLoaderSimple"""
+    if 'ckpt_name' in inputs:
+        result['model'] = inputs['ckpt_name']
+
+
+def _handle_vae_loader(inputs, result):
+    """Extract VAE info"""
+    if 'vae_name' in inputs:
+        result['vae'] = inputs['vae_name']
+
+
+def _handle_lora_loader(inputs, result):
+    """Extract LoRA info"""
+    lora_name = inputs.get('lora_name', '')
+    lora_strength = inputs.get('strength_model', 1.0)
+    if lora_name:
+        if 'loras' not in result:
+            result['loras'] = []
+        result['loras'].append({
+            'name': lora_name,
+            'strength': lora_strength
+        })
+
+
+def _handle_controlnet(inputs, result):
+    """Extract ControlNet info"""
+    cn_name = inputs.get('control_net_name', '') or inputs.get('model', '')
+    cn_strength = inputs.get('strength', 1.0)
+    if cn_name:
+        if 'controlnets' not in result:
+            result['controlnets'] = []
+        result['controlnets'].append({
+            'name': cn_name,
+            'strength': cn_strength
+        })
+
+
+def _handle_empty_latent_image(inputs, result):
+    """Extract image dimensions from EmptyLatentImage"""
+    width = inputs.get('width')
+    height = inputs.get('height')
+    if width and height:
+        result['dimensions'] = f"{width} × {height}"
+
+
+# ComfyUI node class_type -> handler(inputs, result) filling in result
+_NODE_HANDLERS = {
+    'CLIPTextEncode': _handle_clip_text_encode,
+    'KSampler': _handle_ksampler,
+    'CheckpointLoaderSimple': _handle_checkpoint_loader,
+    'VAELoader': _handle_vae_loader,
+    'LoraLoader': _handle_lora_loader,
+    'ControlNetLoader': _handle_controlnet,
+    'ControlNetApply': _handle_controlnet,
+    'EmptyLatentImage': _handle_empty_latent_image,
+}
+
+
+def extract_metadata(filename):
+    """
+    Extract all available metadata from an image file
     
-    @staticmethod
-    def extract_metadata(filename):
-        """
-        Extract all available metadata from an image file
-        
-        Args:
-            filename: Name of the image file in IMAGES_DIR
-            
-        Returns:
-            Dictionary with structured metadata or None if file not found
-        """
-        filepath = os.path.join(IMAGES_DIR, filename)
+    Args:
+        filename: Name of the image file in IMAGES_DIR
         
-        if not os.path.exists(filepath):
+    Returns:
+        Dictionary with structured metadata or None if file not found
+    """
+    filepath = os.path.join(IMAGES_DIR, filename)
+    
+    try:
+        st = os.stat(filepath)
+    except (OSError, ValueError):
+        # Same cases os.path.exists treats as missing
+        return None
+    
+    # Results are cached until the file's mtime or size changes - deep copied,
+    # since the loras/controlnets lists would otherwise be shared with the cache
+    return copy.deepcopy(_extract_metadata_cached(filename, st.st_mtime_ns, st.st_size))
+
+
+@lru_cache(maxsize=1024)
+def _extract_metadata_cached(filename, mtime_ns, size):
+    """
+    Extract metadata for one version of a file
+    
+    mtime_ns and size aren't used here - they're part of the cache key,
+    so a changed file misses the cache. extract_metadata hands callers a
+    deep copy of the result.
+    """
+    filepath = os.path.join(IMAGES_DIR, filename)
+    
+    # Get file extension
+    ext = os.path.splitext(filename)[1].lower()
+    
+    # Currently only support PNG (most common for AI images with metadata)
+    if ext == '.png':
+        return _extract_png_metadata(filepath)
+    elif ext in _JPEG_EXTS:
+        return _extract_jpeg_metadata(filepath)
+    else:
+        return {
+            "quality": "unsupported",
+            "message": f"Metadata extraction not supported for {ext} files"
+        }
+
+
+def _load_json(text):
+    """Parse embedded JSON, with orjson when available"""
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            # e.g. NaN written by the json module - let it have a go
+            pass
+    return json.loads(text)
+
+
+def _decompress_text(data):
+    """Inflate a compressed text chunk, or None if it's too large"""
+    inflater = zlib.decompressobj()
+    text = inflater.decompress(data, _MAX_TEXT_CHUNK)
+    if inflater.unconsumed_tail:
+        return None
+    return text
+
+
+def _read_png_chunks(filepath):
+    """
+    Read a PNG's header and text chunks without touching the image data
+    
+    Walks the chunks up to the first IDAT - text stored after the pixels
+    isn't returned, just as PIL doesn't expose it before decoding.
+    
+    Returns:
+        (header, texts) tuple - header has width, height, format and mode,
+        texts is {keyword: text} - or None if the file isn't a PNG
+    """
+    header = None
+    texts = {}
+    
+    with open(filepath, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < len(_PNG_SIGNATURE):
             return None
-            
-        # Get file extension
-        ext = os.path.splitext(filename)[1].lower()
         
-        # Currently only support PNG (most common for AI images with metadata)
-        if ext == '.png':
-            return MetadataExtractor._extract_png_metadata(filepath)
-        elif ext in ['.jpg', '.jpeg']:
-            return MetadataExtractor._extract_jpeg_metadata(filepath)
-        else:
-            return {
-                "quality": "unsupported",
-                "message": f"Metadata extraction not supported for {ext} files"
-            }
-    
-    @staticmethod
-    def _extract_png_metadata(filepath):
-        """Extract metadata from PNG file"""
-        try:
-            with Image.open(filepath) as img:
-                metadata = {
-                    "quality": "scrubbed",
-                    "width": img.width,
-                    "height": img.height,
-                    "format": img.format,
-                    "mode": img.mode,
-                }
-                
-                # Check for PNG text chunks
-                png_info = img.info if hasattr(img, 'info') else {}
-                
-                # Try to find parameters in common keys
-                parameters_text = None
-                workflow_json = None
-                
-                # ComfyUI stores workflow in 'workflow' or 'prompt' keys
-                if 'workflow' in png_info:
-                    try:
-                        workflow_json = json.loads(png_info['workflow'])
-                        metadata["quality"] = "full"
-                        metadata["has_workflow"] = True
-                    except json.JSONDecodeError:
-                        pass
-                
-                if 'prompt' in png_info:
-                    try:
-                        # Try to parse as JSON (ComfyUI format)
-                        workflow_json = json.loads(png_info['prompt'])
-                        metadata["quality"] = "full"
-                        metadata["has_workflow"] = True
-                    except json.JSONDecodeError:
-                        # If not JSON, treat as text prompt
-                        parameters_text = png_info['prompt']
+        # Chunks are located by offset in a read-only mapping, so only the
+        # pages holding the header and text chunks are ever read in
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if mapped[:8] != _PNG_SIGNATURE:
+                return None
+            
+            size = len(mapped)
+            offset = 8
+            while True:
+                if offset + 8 > size:
+                    raise ValueError("Truncated PNG file")
+                length, chunk_type = _PNG_CHUNK_HEAD.unpack_from(mapped, offset)
+                start = offset + 8
+                end = start + length
+                offset = end + 4  # CRC isn't checked
                 
-                # A1111 stores parameters in 'parameters' key
-                if 'parameters' in png_info:
-                    parameters_text = png_info['parameters']
-                    if metadata["quality"] == "scrubbed":
-                        metadata["quality"] = "partial"
+                if chunk_type in _PNG_STOP_CHUNKS:
+                    break
                 
-                # Check other common keys
-                for key in ['Comment', 'comment', 'Description', 'UserComment']:
-                    if key in png_info and not parameters_text:
-                        parameters_text = png_info[key]
-                        if metadata["quality"] == "scrubbed":
-                            metadata["quality"] = "partial"
+                if chunk_type not in _PNG_READ_CHUNKS:
+                    continue
                 
-                # Parse the parameters text if found
-                if parameters_text:
-                    parsed = MetadataExtractor._parse_parameters_text(parameters_text)
-                    metadata.update(parsed)
+                if end > size:
+                    raise ValueError("Truncated PNG file")
                 
-                # Parse workflow if found
-                if workflow_json:
-                    parsed_workflow = MetadataExtractor._parse_comfyui_workflow(workflow_json)
-                    metadata.update(parsed_workflow)
+                if chunk_type == b'IHDR':
+                    width, height, bit_depth, color_type = _PNG_IHDR.unpack_from(mapped, start)
+                    header = {
+                        "width": width,
+                        "height": height,
+                        "format": "PNG",
+                        "mode": _PNG_MODES.get((bit_depth, color_type)),
+                    }
+                    continue
                 
-                return metadata
+                keyword, _, data = mapped[start:end].partition(b'\0')
+                keyword = keyword.decode('latin-1')
                 
-        except Exception as e:
-            return {
-                "quality": "error",
-                "error": str(e)
-            }
-    
-    @staticmethod
-    def _extract_jpeg_metadata(filepath):
-        """Extract metadata from JPEG file (EXIF data)"""
-        try:
+                if chunk_type == b'tEXt':
+                    texts[keyword] = data.decode('latin-1')
+                elif chunk_type == b'zTXt':
+                    # Compression method byte, then the deflated text
+                    text = _decompress_text(data[1:])
+                    if text is not None:
+                        texts[keyword] = text.decode('latin-1')
+                else:
+                    # Compression flag and method, language tag, translated
+                    # keyword, then UTF-8 text
+                    compressed = data[:1] == b'\1'
+                    _, _, data = data[2:].partition(b'\0')
+                    _, _, data = data.partition(b'\0')
+                    if compressed:
+                        data = _decompress_text(data)
+                        if data is None:
+                            continue
+                    texts[keyword] = data.decode('utf-8', errors='replace')
+    
+    if header is None:
+        raise ValueError("PNG file has no IHDR chunk")
+    return header, texts
+
+
+def _extract_png_metadata(filepath):
+    """Extract metadata from PNG file"""
+    try:
+        # Text chunks are read straight from the file, so the image data
+        # is never read or decoded
+        chunks = _read_png_chunks(filepath)
+        if chunks is not None:
+            header, png_info = chunks
+            metadata = {"quality": "scrubbed", **header}
+        else:
+            # Not actually a PNG despite the extension - let PIL identify it
             with Image.open(filepath) as img:
                 metadata = {
                     "quality": "scrubbed",
@@ -124,223 +361,358 @@ class MetadataExtractor:
                     "format": img.format,
                     "mode": img.mode,
                 }
-                
-                # Try to get EXIF data
-                exif = img.getexif()
-                if exif:
-                    # Check for user comment (sometimes contains generation params)
-                    if 0x9286 in exif:  # UserComment tag
-                        comment = exif[0x9286]
-                        if isinstance(comment, bytes):
-                            comment = comment.decode('utf-8', errors='ignore')
-                        parsed = MetadataExtractor._parse_parameters_text(comment)
-                        metadata.update(parsed)
-                        metadata["quality"] = "partial"
-                
-                return metadata
-                
-        except Exception as e:
-            return {
-                "quality": "error",
-                "error": str(e)
-            }
-    
-    @staticmethod
-    def _parse_parameters_text(text):
-        """
-        Parse A1111-style parameters text
-        Format: Positive prompt\nNegative prompt: ...\nSteps: X, Sampler: Y, CFG scale: Z, ...
-        """
-        result = {}
+                png_info = dict(img.info)
         
-        if not text or len(text.strip()) == 0:
-            return result
+        # Try to find parameters in common keys
+        parameters_text = None
+        workflow_json = None
         
-        lines = text.strip().split('\n')
+        # ComfyUI stores workflow in 'workflow' or 'prompt' keys
+        if 'workflow' in png_info:
+            try:
+                workflow_json = _load_json(png_info['workflow'])
+                metadata["quality"] = "full"
+                metadata["has_workflow"] = True
+            except json.JSONDecodeError:
+                pass
         
-        # First line is typically the positive prompt
-        if len(lines) > 0:
-            first_line = lines[0].strip()
-            # Check if first line contains "Negative prompt:" - if so, no positive prompt
-            if not first_line.lower().startswith('negative prompt:'):
-                result["positive_prompt"] = first_line
+        if 'prompt' in png_info:
+            try:
+                # Try to parse as JSON (ComfyUI format)
+                workflow_json = _load_json(png_info['prompt'])
+                metadata["quality"] = "full"
+                metadata["has_workflow"] = True
+            except json.JSONDecodeError:
+                # If not JSON, treat as text prompt
+                parameters_text = png_info['prompt']
         
-        # Look for "Negative prompt:" line
-        negative_prompt = ""
-        params_line = ""
+        # A1111 stores parameters in 'parameters' key
+        if 'parameters' in png_info:
+            parameters_text = png_info['parameters']
+            if metadata["quality"] == "scrubbed":
+                metadata["quality"] = "partial"
         
-        for i, line in enumerate(lines[1:], 1):
-            line = line.strip()
-            
-            if line.lower().startswith('negative prompt:'):
-                # Extract negative prompt (might be on same line or next lines)
-                negative_prompt = line[len('negative prompt:'):].strip()
-                
-                # Check if there are more lines before parameters
-                for j in range(i + 1, len(lines)):
-                    next_line = lines[j].strip()
-                    # If line contains key parameters, it's the params line
-                    if any(key in next_line.lower() for key in ['steps:', 'sampler:', 'cfg scale:', 'seed:']):
-                        params_line = next_line
-                        break
-                    else:
-                        # Continue negative prompt on next line
-                        negative_prompt += " " + next_line
-                break
+        # Check other common keys
+        for key in _COMMENT_KEYS:
+            if key in png_info and not parameters_text:
+                parameters_text = png_info[key]
+                if metadata["quality"] == "scrubbed":
+                    metadata["quality"] = "partial"
         
-        if negative_prompt:
-            result["negative_prompt"] = negative_prompt.strip()
+        # Parse the parameters text if found
+        if parameters_text:
+            parsed = _parse_parameters_text(parameters_text)
+            metadata.update(parsed)
         
-        # Parse parameters line (format: "Steps: 30, Sampler: DPM++ 2M, CFG scale: 7.5, ...")
-        if params_line:
-            params = {}
-            for param in params_line.split(','):
-                param = param.strip()
-                if ':' in param:
-                    key, value = param.split(':', 1)
-                    key = key.strip().lower()
-                    value = value.strip()
-                    
-                    # Map common parameter names
-                    if key == 'steps':
-                        result["steps"] = value
-                    elif key in ['sampler', 'sampling method']:
-                        result["sampler"] = value
-                    elif key in ['cfg scale', 'cfg']:
-                        result["cfg_scale"] = value
-                    elif key == 'seed':
-                        result["seed"] = value
-                    elif key in ['size', 'resolution']:
-                        result["dimensions"] = value
-                    elif key in ['clip skip', 'clipskip']:
-                        result["clip_skip"] = value
-                    elif key == 'model':
-                        result["model"] = value
-                    elif key == 'model hash':
-                        result["model_hash"] = value
-                    elif key == 'vae':
-                        result["vae"] = value
+        # Parse workflow if found
+        if workflow_json:
+            parsed_workflow = _parse_comfyui_workflow(workflow_json)
+            metadata.update(parsed_workflow)
         
-        return result
-    
-    @staticmethod
-    def _parse_comfyui_workflow(workflow):
-        """
-        Parse ComfyUI workflow JSON to extract generation parameters
-        ComfyUI workflows are complex node graphs - extract key information
-        """
-        result = {
-            "has_workflow": True,
-            "workflow_nodes": len(workflow) if isinstance(workflow, dict) else 0
+        return metadata
+            
+    except Exception as e:
+        return {
+            "quality": "error",
+            "error": str(e)
         }
+
+
+def _read_exif_user_comment(tiff):
+    """
+    Find the UserComment tag of an EXIF block
+    
+    Looks in IFD0 first, then in the Exif sub-IFD where the EXIF spec (and
+    A1111) puts it.
+    
+    Args:
+        tiff: EXIF data from the TIFF header on
         
-        if not isinstance(workflow, dict):
-            return result
-        
-        # ComfyUI workflow is a dict of nodes
-        # Common node types: KSampler, CLIPTextEncode, CheckpointLoaderSimple, VAELoader, LoraLoader
+    Returns:
+        (found, value) tuple - value is bytes, or str for an ASCII tag,
+        as PIL returns them
+    """
+    structs = _TIFF_STRUCTS.get(tiff[:2])
+    if structs is None or len(tiff) < 8:
+        return False, None
+    offset_struct, count_struct, entry_struct = structs
+    
+    # IFD0, then the Exif sub-IFD once its pointer turns up in IFD0
+    ifd_offsets = [offset_struct.unpack_from(tiff, 4)[0]]
+    for ifd_offset in ifd_offsets:
+        if ifd_offset + 2 > len(tiff):
+            continue
         
-        for node_id, node_data in workflow.items():
-            if not isinstance(node_data, dict):
-                continue
-            
-            class_type = node_data.get('class_type', '')
-            inputs = node_data.get('inputs', {})
+        entry_count = count_struct.unpack_from(tiff, ifd_offset)[0]
+        for i in range(entry_count):
+            entry = ifd_offset + 2 + 12 * i
+            if entry + 12 > len(tiff):
+                break
             
-            # Extract prompts from CLIPTextEncode nodes
-            if class_type == 'CLIPTextEncode':
-                text = inputs.get('text', '')
-                # Heuristic: positive prompts are usually longer
-                if text:
-                    if 'positive_prompt' not in result or len(text) > len(result.get('positive_prompt', '')):
-                        if len(text) > 100:  # Likely positive prompt
-                            result['positive_prompt'] = text
-                        elif 'positive_prompt' not in result:
-                            result['positive_prompt'] = text
-                        else:
-                            result['negative_prompt'] = text
+            tag, tag_type, count = entry_struct.unpack_from(tiff, entry)
+            if tag == _EXIF_IFD_POINTER and len(ifd_offsets) == 1:
+                ifd_offsets.append(offset_struct.unpack_from(tiff, entry + 8)[0])
+                continue
+            if tag != _EXIF_USER_COMMENT:
+                continue
             
-            # Extract sampler settings from KSampler
-            elif class_type == 'KSampler':
-                if 'seed' in inputs:
-                    result['seed'] = str(inputs['seed'])
-                if 'steps' in inputs:
-                    result['steps'] = str(inputs['steps'])
-                if 'cfg' in inputs:
-                    result['cfg_scale'] = str(inputs['cfg'])
-                if 'sampler_name' in inputs:
-                    result['sampler'] = inputs['sampler_name']
-                if 'scheduler' in inputs:
-                    if 'sampler' in result:
-                        result['sampler'] = f"{result['sampler']} {inputs['scheduler']}"
-                    else:
-                        result['sampler'] = inputs['scheduler']
+            # Values of up to 4 bytes are stored in the entry itself
+            if tag_type not in _TIFF_BYTE_TYPES:
+                return False, None
+            if count <= 4:
+                value = tiff[entry + 8:entry + 8 + count]
+            else:
+                value_offset = offset_struct.unpack_from(tiff, entry + 8)[0]
+                value = tiff[value_offset:value_offset + count]
             
-            # Extract model info from CheckpointLoaderSimple
-            elif class_type == 'CheckpointLoaderSimple':
-                if 'ckpt_name' in inputs:
-                    result['model'] = inputs['ckpt_name']
+            if tag_type == 2:
+                if value.endswith(b'\0'):
+                    value = value[:-1]
+                value = value.decode('latin-1', errors='replace')
+            return True, value
+    
+    return False, None
+
+
+def _decode_user_comment(value):
+    """
+    Text of an EXIF UserComment value
+    
+    Byte values start with an 8-byte character code. UNICODE text is UTF-16
+    in either byte order (A1111 writes big-endian).
+    """
+    if not isinstance(value, bytes):
+        return value
+    
+    code, text = value[:8], value[8:]
+    if code == b'UNICODE\0':
+        encoding = 'utf-16-le' if text[1:2] == b'\0' and text[:1] != b'\0' else 'utf-16-be'
+        return text.decode(encoding, errors='ignore').rstrip('\0')
+    if code in (b'ASCII\0\0\0', b'\0' * 8):
+        return text.decode('utf-8', errors='ignore').rstrip('\0')
+    return value.decode('utf-8', errors='ignore')
+
+
+def _read_jpeg_segments(filepath):
+    """
+    Read a JPEG's frame header and EXIF UserComment without touching the
+    compressed image data
+    
+    Walks the marker segments up to the start of scan.
+    
+    Returns:
+        (header, found, comment) tuple - header has width, height, format
+        and mode, comment is the UserComment value if found - or None if
+        the file isn't a JPEG this can read
+    """
+    header = None
+    exif_seen = False
+    found, comment = False, None
+    
+    with open(filepath, 'rb') as f:
+        if f.read(2) != b'\xff\xd8':
+            return None
+        
+        while True:
+            byte = f.read(1)
+            if byte != b'\xff':
+                break
+            marker = f.read(1)
+            while marker == b'\xff':  # Fill bytes
+                marker = f.read(1)
+            if not marker:
+                break
+            marker = marker[0]
             
-            # Extract VAE info
-            elif class_type == 'VAELoader':
-                if 'vae_name' in inputs:
-                    result['vae'] = inputs['vae_name']
+            # Start of scan / end of image - compressed data follows
+            if marker in (0xDA, 0xD9):
+                break
+            # Markers without a length
+            if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+                continue
             
-            # Extract LoRA info
-            elif class_type == 'LoraLoader':
-                lora_name = inputs.get('lora_name', '')
-                lora_strength = inputs.get('strength_model', 1.0)
-                if lora_name:
-                    if 'loras' not in result:
-                        result['loras'] = []
-                    result['loras'].append({
-                        'name': lora_name,
-                        'strength': lora_strength
-                    })
+            segment_length = f.read(2)
+            if len(segment_length) < 2:
+                break
+            data = f.read(int.from_bytes(segment_length, 'big') - 2)
             
-            # Extract ControlNet info
-            elif class_type in ['ControlNetLoader', 'ControlNetApply']:
-                cn_name = inputs.get('control_net_name', '') or inputs.get('model', '')
-                cn_strength = inputs.get('strength', 1.0)
-                if cn_name:
-                    if 'controlnets' not in result:
-                        result['controlnets'] = []
-                    result['controlnets'].append({
-                        'name': cn_name,
-                        'strength': cn_strength
-                    })
+            if marker in _JPEG_SOF_MARKERS and header is None and len(data) >= 6:
+                height, width, components = struct.unpack_from('>HHB', data, 1)
+                header = {
+                    "width": width,
+                    "height": height,
+                    "format": "JPEG",
+                    "mode": _JPEG_MODES.get(components),
+                }
+            elif marker == 0xE1 and not exif_seen and data[:6] == b'Exif\0\0':
+                exif_seen = True
+                found, comment = _read_exif_user_comment(data[6:])
             
-            # Extract image dimensions from EmptyLatentImage or other nodes
-            elif class_type == 'EmptyLatentImage':
-                width = inputs.get('width')
-                height = inputs.get('height')
-                if width and height:
-                    result['dimensions'] = f"{width} × {height}"
+            if header is not None and exif_seen:
+                break
+    
+    if header is None:
+        return None
+    return header, found, comment
+
+
+def _extract_jpeg_metadata(filepath):
+    """Extract metadata from JPEG file (EXIF data)"""
+    try:
+        # Segments are read straight from the file, so the compressed
+        # image data is never read or decoded
+        segments = _read_jpeg_segments(filepath)
+        if segments is not None:
+            header, found, comment = segments
+            metadata = {"quality": "scrubbed", **header}
+        else:
+            # Not a plain JPEG despite the extension - let PIL identify it
+            with Image.open(filepath) as img:
+                metadata = {
+                    "quality": "scrubbed",
+                    "width": img.width,
+                    "height": img.height,
+                    "format": img.format,
+                    "mode": img.mode,
+                }
+                
+                # Try to get EXIF data
+                exif = img.getexif()
+                found = _EXIF_USER_COMMENT in exif
+                comment = exif.get(_EXIF_USER_COMMENT)
+                if not found:
+                    # get_ifd parses the Exif sub-IFD once and caches it
+                    exif_ifd = exif.get_ifd(_EXIF_IFD_POINTER)
+                    found = _EXIF_USER_COMMENT in exif_ifd
+                    comment = exif_ifd.get(_EXIF_USER_COMMENT)
         
+        if found:
+            parsed = _parse_parameters_text(_decode_user_comment(comment))
+            metadata.update(parsed)
+            metadata["quality"] = "partial"
+        
+        return metadata
+            
+    except Exception as e:
+        return {
+            "quality": "error",
+            "error": str(e)
+        }
+
+
+def _parse_parameters_text(text):
+    """
+    Parse A1111-style parameters text
+    Format: Positive prompt\nNegative prompt: ...\nSteps: X, Sampler: Y, CFG scale: Z, ...
+    """
+    result = {}
+    
+    text = text.strip() if text else ''
+    if not text:
         return result
     
-    @staticmethod
-    def get_metadata_summary(metadata):
-        """
-        Get a human-readable summary of metadata quality
-        
-        Returns:
-            Tuple of (status, message, icon)
-        """
-        if not metadata:
-            return ("error", "Failed to read metadata", "❌")
+    # Each line is stripped once, up front
+    lines = [line.strip() for line in text.splitlines()]
+    
+    # First line is typically the positive prompt
+    first_line = lines[0]
+    # Check if first line contains "Negative prompt:" - if so, no positive prompt
+    if not _NEGATIVE_PROMPT_RE.match(first_line):
+        result["positive_prompt"] = first_line
+    
+    # Look for "Negative prompt:" line
+    negative_prompt = ""
+    params_line = ""
+    
+    for i in range(1, len(lines)):
+        line = lines[i]
         
-        quality = metadata.get("quality", "unknown")
+        match = _NEGATIVE_PROMPT_RE.match(line)
+        if match:
+            # Extract negative prompt (might be on same line or next lines)
+            negative_prompt = line[match.end():].strip()
+            
+            # Check if there are more lines before parameters
+            for j in range(i + 1, len(lines)):
+                next_line = lines[j]
+                # If line contains key parameters, it's the params line
+                if _PARAMS_LINE_RE.search(next_line):
+                    params_line = next_line
+                    break
+                else:
+                    # Continue negative prompt on next line
+                    negative_prompt += " " + next_line
+            break
+    
+    if negative_prompt:
+        result["negative_prompt"] = negative_prompt.strip()
+    
+    # Parse parameters line (format: "Steps: 30, Sampler: DPM++ 2M, CFG scale: 7.5, ...")
+    if params_line:
+        for match in _PARAM_RE.finditer(params_line):
+            # Map common parameter names
+            field = _KEY_MAP.get(match.group(1).strip().lower())
+            if field:
+                result[field] = match.group(2).strip().strip('"')
+    
+    return result
+
+
+def _parse_comfyui_workflow(workflow):
+    """
+    Parse ComfyUI workflow JSON to extract generation parameters
+    ComfyUI workflows are complex node graphs - extract key information
+    """
+    result = {
+        "has_workflow": True,
+        "workflow_nodes": len(workflow) if isinstance(workflow, dict) else 0
+    }
+    
+    if not isinstance(workflow, dict):
+        return result
+    
+    # ComfyUI workflow is a dict of nodes
+    # Common node types: KSampler, CLIPTextEncode, CheckpointLoaderSimple, VAELoader, LoraLoader
+    
+    for node_data in workflow.values():
+        if not isinstance(node_data, dict):
+            continue
         
-        if quality == "full":
-            return ("full", "Full metadata with ComfyUI workflow", "✅")
-        elif quality == "partial":
-            return ("partial", "Partial metadata (no workflow)", "⚠️")
-        elif quality == "scrubbed":
-            return ("scrubbed", "No metadata found (image was scrubbed)", "❌")
-        elif quality == "unsupported":
-            return ("scrubbed", metadata.get("message", "Unsupported format"), "❌")
-        elif quality == "error":
-            return ("error", f"Error: {metadata.get('error', 'Unknown error')}", "❌")
-        else:
-            return ("scrubbed", "Unknown metadata status", "⚠️")
+        class_type = node_data.get('class_type')
+        handler = _NODE_HANDLERS.get(class_type) if isinstance(class_type, str) else None
+        if handler is not None:
+            handler(node_data.get('inputs') or {}, result)
+    
+    return result
+
+
+def get_metadata_summary(metadata):
+    """
+    Get a human-readable summary of metadata quality
+    
+    Returns:
+        Tuple of (status, message, icon)
+    """
+    if not metadata:
+        return ("error", "Failed to read metadata", "❌")
+    
+    quality = metadata.get("quality", "unknown")
+    
+    if quality == "full":
+        return ("full", "Full metadata with ComfyUI workflow", "✅")
+    elif quality == "partial":
+        return ("partial", "Partial metadata (no workflow)", "⚠️")
+    elif quality == "scrubbed":
+        return ("scrubbed", "No metadata found (image was scrubbed)", "❌")
+    elif quality == "unsupported":
+        return ("scrubbed", metadata.get("message", "Unsupported format"), "❌")
+    elif quality == "error":
+        return ("error", f"Error: {metadata.get('error', 'Unknown error')}", "❌")
+    else:
+        return ("scrubbed", "Unknown metadata status", "⚠️")
+
+
+class MetadataExtractor:
+    """Extract and parse metadata from AI-generated images (kept for existing callers)"""
+    extract_metadata = staticmethod(extract_metadata)
+    get_metadata_summary = staticmethod(get_metadata_summary)
@@ -0,0 +1,133 @@
+"""
+In-memory secondary indexes over db['models']
+
+Version linking probes the whole database once per CivitAI version, and the
+media auditor looks models up by hash prefix. These indexes are built lazily
+on a loaded database dict the first time a lookup needs them and reused for
+every later lookup against that same dict.
+
+They are a snapshot of the dict when first needed and are not updated as
+models change. Each linking pass or audit runs on a freshly loaded dict and
+sets hashes, IDs and sizes before its first lookup. load_db drops the
+indexes from a batch's pending dict before handing it out again, and
+save_db strips them before writing. Code that changes an indexed field and
+then looks models up again on the same dict must pop db[INDEX_KEY] first.
+"""
+
+import math
+
+INDEX_KEY = '_indexes'
+
+
+def ensure_indexes(db):
+    """
+    Get the indexes for a database dict, building them on first use
+    
+    Args:
+        db: Database dictionary
+    
+    Returns:
+        Dictionary of buckets (missing models only in 'media_prefixes'):
+        - 'hashes':   uppercased fileHash/highHash/lowHash -> [entries]
+        - 'prefixes': first 10 chars of 64-char hashes -> [entries]
+        - 'ids':      (civitaiModelId, civitaiVersionId) -> [entries]
+        - 'sizes':    [entries] for models with a known file size
+        - 'size_buckets': int(log2(size)) -> [entries] for positive sizes
+        - 'family_ids': path -> CivitAI Model ID as string (get_model_id), or None
+        - 'media_prefixes': lowercased first 8 chars of fileHash -> [entries]
+        
+        Entries are ((ordinal, position), path, model, value) tuples. ordinal
+        is the model's place in db['models'] and position is which of its
+        hashes matched (0 = fileHash, 1 = highHash, 2 = lowHash; always 0
+        outside 'hashes'/'prefixes'). value is the matched hash or file size,
+        or None. Buckets are kept in (ordinal, position) order, so the first
+        entry is the model and hash a linear scan would have found.
+    """
+    indexes = db.get(INDEX_KEY)
+    if indexes is None:
+        indexes = _build_indexes(db)
+        db[INDEX_KEY] = indexes
+    return indexes
+
+
+def _build_indexes(db):
+    """Build all indexes with a single pass over db['models']"""
+    indexes = {
+        'hashes': {},
+        'prefixes': {},
+        'ids': {},
+        'sizes': [],
+        'size_buckets': {},
+        'family_ids': {},
+        'media_prefixes': {}
+    }
+    
+    # Imported here to avoid a circular import - once per build, not per model
+    from app.services.civitai_version_linking import get_model_id
+    
+    for ordinal, (path, model) in enumerate(db['models'].items()):
+        _index_model(indexes, ordinal, path, model, get_model_id)
+    
+    return indexes
+
+
+def _index_model(indexes, ordinal, path, model, get_model_id):
+    """Add one model's entries to every index"""
+    # (index name, key) pairs this model is already filed under
+    keys = set()
+    
+    # Media filename prefix - missing models still own their media
+    file_hash = model.get('fileHash')
+    if file_hash and len(file_hash) >= 8:
+        entry = ((ordinal, 0), path, model, None)
+        _add_entry(indexes['media_prefixes'], file_hash[:8].lower(), entry, keys, 'media_prefixes')
+    
+    # Everything else is for version linking, which ignores missing models
+    if path.startswith('_missing/'):
+        return
+    
+    # Family ID - parsed from the URL when not scraped, so worth caching
+    indexes['family_ids'][path] = get_model_id(model)
+    
+    # Hashes - main file first, then variants (the order find_hash_match checks them)
+    model_hashes = [model.get('fileHash')]
+    variants = model.get('variants')
+    if variants:
+        model_hashes.append(variants.get('highHash'))
+        model_hashes.append(variants.get('lowHash'))
+    
+    for position, model_hash in enumerate(model_hashes):
+        model_hash = (model_hash or '').upper()
+        if not model_hash:
+            continue
+        
+        entry = ((ordinal, position), path, model, model_hash)
+        _add_entry(indexes['hashes'], model_hash, entry, keys, 'hashes')
+        if len(model_hash) == 64:
+            _add_entry(indexes['prefixes'], model_hash[:10], entry, keys, 'prefixes')
+    
+    # CivitAI IDs
+    id_key = (model.get('civitaiModelId'), model.get('civitaiVersionId'))
+    _add_entry(indexes['ids'], id_key, ((ordinal, 0), path, model, None), keys, 'ids')
+    
+    # File size
+    model_size = model.get('fileSize') or model.get('_fileSize', 0)
+    if model_size:
+        entry = ((ordinal, 0), path, model, model_size)
+        indexes['sizes'].append(entry)
+        if model_size > 0:
+            _add_entry(indexes['size_buckets'], size_bucket(model_size), entry, keys, 'size_buckets')
+
+
+def size_bucket(size):
+    """Log2 bucket a positive file size falls into"""
+    return int(math.log2(size))
+
+
+def _add_entry(index, key, entry, keys, index_name):
+    """Add an entry to a keyed bucket, once per model per key"""
+    if (index_name, key) in keys:
+        return
+    
+    index.setdefault(key, []).append(entry)
+    keys.add((index_name, key))
@@ -0,0 +1,39 @@
+"""
+Shared rate-limit bookkeeping for the services that call external sites
+
+CivArchive and CivitAI each allow one request per fixed delay, measured
+from the last request made. This works out where that window starts.
+"""
+from datetime import datetime, timedelta
+
+# Longest wait a 429 response can impose
+MAX_BACKOFF = 300
+
+# Wait after a 429 that doesn't say how long
+DEFAULT_BACKOFF = 60
+
+
+def rate_limit_window_start(response, delay):
+    """
+    Timestamp to record as a service's last request
+    
+    Call it in a finally around the request, so timeouts and connection
+    errors count toward the rate limit too.
+    
+    Args:
+        response: Response received, or None if the request raised
+        delay: The service's seconds between requests
+    
+    Returns:
+        datetime: Now, or later if a 429 asked for a longer wait than
+        delay (Retry-After in seconds, capped at MAX_BACKOFF)
+    """
+    now = datetime.now()
+    if response is None or response.status_code != 429:
+        return now
+    
+    retry_after = response.headers.get('Retry-After', '')
+    backoff = min(int(retry_after), MAX_BACKOFF) if retry_after.isdigit() else DEFAULT_BACKOFF
+    if backoff > delay:
+        now += timedelta(seconds=backoff - delay)
+    return now
@@ -2,13 +2,24 @@
 Self-Healing Service for automatic URL recovery
 Coordinates between CivArchive, CivitAI, and database services
 """
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import time
+import re
 from app.services.civarchive import get_civarchive_service
 from app.services.civitai import get_civitai_service
+from app.services.console_log import get_logger
 from app.services.database import load_db, save_db
 
 
+logger = get_logger(__name__)
+
+# Model ID in a CivitAI model URL
+_MODEL_ID_RE = re.compile(r'/models/(\d+)')
+
+# Successful heals to batch up before heal_all_models writes the database
+_CHECKPOINT_EVERY = 25
+
+
 class SelfHealingService:
     """
     Service for automatically recovering missing URLs using archive sources
@@ -20,13 +31,15 @@ class SelfHealingService:
         self.healing_log = []
         self.max_log_size = 50
     
-    def heal_model(self, model_path, model_data):
+    def heal_model(self, model_path, model_data, archive_result=None):
         """
         Attempt to heal a single model by finding its URL
         
         Args:
             model_path: Path to the model file (database key)
             model_data: Current model data from database
+            archive_result: Result of searching the archive for this model's
+                hash, if already looked up (default: search here)
         
         Returns:
             dict: Healing result with status and any recovered data
@@ -59,14 +72,12 @@ class SelfHealingService:
                 result['action'] = 'skipped_has_url'
                 return result
             
-            print(f"\n{'='*70}")
-            print(f"🔧 Attempting to heal: {result['modelName']}")
-            print(f"   Path: {model_path}")
-            print(f"   Hash: {file_hash[:16]}...")
-            print(f"{'='*70}")
+            logger.info("\n🔧 Attempting to heal: %s", result['modelName'])
+            logger.debug("   Path: %s\n   Hash: %s...", model_path, file_hash[:16])
             
             # Step 1: Search archive for the hash
-            archive_result = self.civarchive.search_by_hash(file_hash)
+            if archive_result is None:
+                archive_result = self.civarchive.search_by_hash(file_hash)
             
             if 'error' in archive_result:
                 result['message'] = f"Archive search error: {archive_result['error']}"
@@ -80,7 +91,7 @@ class SelfHealingService:
                 return result
             
             # Step 2: Process search results
-            print(f"\n📋 Found {len(archive_result['results'])} result(s) in archive")
+            logger.info("📋 Found %d result(s) in archive", len(archive_result['results']))
             
             # Prioritize CivitAI results
             civitai_results = [r for r in archive_result['results'] if r['source'] == 'civitai']
@@ -115,7 +126,7 @@ class SelfHealingService:
             result['action'] = 'found_but_failed'
             
         except Exception as e:
-            print(f"❌ Healing error: {e}")
+            logger.error("❌ Healing error: %s", e)
             result['message'] = f"Healing failed: {str(e)}"
             result['action'] = 'error_exception'
             result['metadata']['exception'] = str(e)
@@ -149,14 +160,12 @@ class SelfHealingService:
         civitai_url = archive_result['url']
         status = archive_result['status']
         
-        print(f"\n🎯 Processing CivitAI result:")
-        print(f"   URL: {civitai_url}")
-        print(f"   Status: {status}")
+        logger.debug("🎯 Processing CivitAI result:\n   URL: %s\n   Status: %s", civitai_url, status)
         
         # If the URL is live, scrape it
         if status == 'live':
             try:
-                print(f"   ✅ Original page is live - scraping...")
+                logger.debug("   ✅ Original page is live - scraping...")
                 
                 # Scrape the CivitAI page
                 scraped = self.civitai.scrape_model_page(
@@ -188,7 +197,7 @@ class SelfHealingService:
                     result['metadata']['availableVersions'] = len(scraped['versions'])
                 
             except Exception as e:
-                print(f"   ❌ Failed to scrape live URL: {e}")
+                logger.warning("   ❌ Failed to scrape live URL: %s", e)
                 result['message'] = f"Live URL found but scraping failed: {str(e)}"
                 result['action'] = 'error_scraping_live'
                 result['metadata']['scrapingError'] = str(e)
@@ -242,8 +251,7 @@ class SelfHealingService:
             }
         }
         
-        print(f"\n🔗 Found non-CivitAI source: {source}")
-        print(f"   URL: {url}")
+        logger.debug("🔗 Found non-CivitAI source: %s\n   URL: %s", source, url)
         
         return result
     
@@ -285,8 +293,7 @@ class SelfHealingService:
             str: URL with correct version parameter
         """
         # Extract model ID from URL
-        import re
-        model_match = re.search(r'/models/(\d+)', base_url)
+        model_match = _MODEL_ID_RE.search(base_url)
         if not model_match:
             return base_url
         
@@ -304,9 +311,7 @@ class SelfHealingService:
         Returns:
             dict: Summary of healing results
         """
-        print(f"\n{'='*70}")
-        print(f"🏥 Starting batch healing process")
-        print(f"{'='*70}\n")
+        logger.info("\n🏥 Starting batch healing process")
         
         db = load_db()
         models = db.get('models', {})
@@ -331,50 +336,66 @@ class SelfHealingService:
         
         if limit:
             models_to_process = models_to_process[:limit]
-            print(f"📊 Processing {len(models_to_process)} of {summary['total']} models (limit={limit})")
+            logger.info("📊 Processing %d of %d models (limit=%s)", len(models_to_process), summary['total'], limit)
         else:
-            print(f"📊 Processing all {len(models_to_process)} models without URLs")
-        
-        for i, (path, data) in enumerate(models_to_process, 1):
-            print(f"\n[{i}/{len(models_to_process)}] Processing: {path}")
-            
-            result = self.heal_model(path, data)
-            summary['processed'] += 1
-            
-            if result['action'].startswith('skipped'):
-                summary['skipped'] += 1
-            elif result['success']:
-                summary['success'] += 1
-                # Update the database
-                self._update_model_in_db(path, result, db)
-            else:
-                summary['failed'] += 1
+            logger.info("📊 Processing all %d models without URLs", len(models_to_process))
+        
+        # Archive searches only wait on the archive's own rate limit, so they
+        # run ahead on a worker thread while CivitAI pages are scraped here
+        search_hashes = dict.fromkeys(data['fileHash'] for _, data in models_to_process
+                                      if self._needs_archive_search(data))
+        executor = ThreadPoolExecutor(max_workers=1)
+        unsaved = 0
+        try:
+            archive_lookups = {file_hash: executor.submit(self.civarchive.search_by_hash, file_hash)
+                               for file_hash in search_hashes}
             
-            summary['results'].append(result)
+            for i, (path, data) in enumerate(models_to_process, 1):
+                logger.info("\n[%d/%d] Processing: %s", i, len(models_to_process), path)
+                
+                lookup = archive_lookups.get(data.get('fileHash')) if self._needs_archive_search(data) else None
+                result = self.heal_model(path, data, archive_result=lookup.result() if lookup else None)
+                summary['processed'] += 1
+                
+                if result['action'].startswith('skipped'):
+                    summary['skipped'] += 1
+                elif result['success']:
+                    summary['success'] += 1
+                    # Update the database
+                    self._update_model_in_db(path, result, db)
+                    unsaved += 1
+                    
+                    # Checkpoint so a crash or interrupt loses at most a few heals
+                    if unsaved >= _CHECKPOINT_EVERY:
+                        save_db(db)
+                        unsaved = 0
+                else:
+                    summary['failed'] += 1
+                
+                summary['results'].append(result)
+        finally:
+            executor.shutdown(cancel_futures=True)
             
-            # Rate limiting between models
-            if i < len(models_to_process):
-                print("   ⏳ Waiting 5 seconds before next model...")
-                time.sleep(5)
+            # Save whatever has not been checkpointed yet, even if the batch was cut short
+            if unsaved:
+                save_db(db)
         
-        # Save database if any changes were made
         if summary['success'] > 0:
-            save_db(db)
-            print(f"\n💾 Database updated with {summary['success']} recovered URLs")
+            logger.info("\n💾 Database updated with %d recovered URLs", summary['success'])
         
         summary['completedAt'] = datetime.now().isoformat()
         
-        print(f"\n{'='*70}")
-        print(f"🏥 Batch healing complete")
-        print(f"{'='*70}")
-        print(f"   Processed: {summary['processed']}")
-        print(f"   Success:   {summary['success']}")
-        print(f"   Failed:    {summary['failed']}")
-        print(f"   Skipped:   {summary['skipped']}")
-        print(f"{'='*70}\n")
+        logger.info("\n🏥 Batch healing complete\n"
+                    "   Processed: %d\n   Success:   %d\n   Failed:    %d\n   Skipped:   %d",
+                    summary['processed'], summary['success'], summary['failed'], summary['skipped'])
         
         return summary
     
+    def _needs_archive_search(self, model_data):
+        """Whether heal_model would search the archive for this model"""
+        civitai_url = model_data.get('civitaiUrl')
+        return bool(model_data.get('fileHash')) and not (civitai_url and civitai_url.strip())
+    
     def _apply_healing_to_model(self, model, healing_result):
         """
         Apply healing results directly to a model dictionary
@@ -386,48 +407,10 @@ class SelfHealingService:
         if not healing_result.get('success') or not healing_result.get('newUrl'):
             return
         
-        # Update URL and IDs based on source
-        if healing_result['source'] == 'civitai':
-            # Extract model ID and version ID from URL
-            from app.services.civitai import get_civitai_service
-            service = get_civitai_service()
-            ids = service.extract_ids_from_url(healing_result['newUrl'])
-            
-            # Set both the URL and the IDs (IDs are what the app actually uses)
-            model['civitaiUrl'] = healing_result['newUrl']
-            model['civitaiModelId'] = ids['modelId']
-            if ids.get('versionId'):
-                model['civitaiVersionId'] = ids['versionId']
-            
-            print(f"   ✅ Updated model: civitaiModelId={ids['modelId']}, civitaiVersionId={ids.get('versionId')}")
-        elif healing_result['source'] == 'huggingface':
-            model['huggingFaceUrl'] = healing_result['newUrl']
-        else:
-            model['otherUrl'] = healing_result['newUrl']
-        
-        # Add healing history
-        if 'healingHistory' not in model:
-            model['healingHistory'] = []
-        
-        model['healingHistory'].append({
-            'timestamp': healing_result['timestamp'],
-            'action': healing_result['action'],
-            'source': healing_result['source'],
-            'url': healing_result['newUrl'],
-            'message': healing_result['message']
-        })
-        
-        # If we have scraped data, optionally update model metadata
-        if 'scrapedData' in healing_result.get('metadata', {}):
-            scraped = healing_result['metadata']['scrapedData']
-            
-            # Update tags if empty
-            if not model.get('tags'):
-                model['tags'] = scraped.get('tags', [])
-            
-            # Update trigger words if empty
-            if not model.get('triggerWords'):
-                model['triggerWords'] = scraped.get('trainedWords', [])
+        ids = self._write_healed_fields(model, healing_result)
+        if ids:
+            logger.debug("   ✅ Updated model: civitaiModelId=%s, civitaiVersionId=%s",
+                         ids['modelId'], ids.get('versionId'))
     
     def _update_model_in_db(self, model_path, healing_result, db):
         """
@@ -442,12 +425,43 @@ class SelfHealingService:
         if not model:
             return
         
+        self._write_healed_fields(model, healing_result)
+        logger.debug("   ✅ Updated database entry for %s", model_path)
+    
+    def _write_healed_fields(self, model, healing_result):
+        """
+        Write a healing result's URL, IDs, history entry and scraped metadata
+        into a model dict
+        
+        heal_model() already applies its result to the dict it was given, which
+        is usually the database entry itself, so a result that is already the
+        latest history entry is not written a second time.
+        
+        Args:
+            model: Model dict to update (modified in place)
+            healing_result: Result from healing process
+        
+        Returns:
+            dict: IDs extracted from a CivitAI URL, or None for other sources
+                  or an already-applied result
+        """
+        history_entry = {
+            'timestamp': healing_result['timestamp'],
+            'action': healing_result['action'],
+            'source': healing_result['source'],
+            'url': healing_result['newUrl'],
+            'message': healing_result['message']
+        }
+        
+        history = model.setdefault('healingHistory', [])
+        if history and history[-1] == history_entry:
+            return None
+        
         # Update URL and IDs based on source
+        ids = None
         if healing_result['source'] == 'civitai':
             # Extract model ID and version ID from URL
-            from app.services.civitai import get_civitai_service
-            service = get_civitai_service()
-            ids = service.extract_ids_from_url(healing_result['newUrl'])
+            ids = self.civitai.extract_ids_from_url(healing_result['newUrl'])
             
             # Set both the URL and the IDs (IDs are what the app actually uses)
             model['civitaiUrl'] = healing_result['newUrl']
@@ -459,17 +473,7 @@ class SelfHealingService:
         else:
             model['otherUrl'] = healing_result['newUrl']
         
-        # Add healing history
-        if 'healingHistory' not in model:
-            model['healingHistory'] = []
-        
-        model['healingHistory'].append({
-            'timestamp': healing_result['timestamp'],
-            'action': healing_result['action'],
-            'source': healing_result['source'],
-            'url': healing_result['newUrl'],
-            'message': healing_result['message']
-        })
+        history.append(history_entry)
         
         # If we have scraped data, optionally update model metadata
         if 'scrapedData' in healing_result.get('metadata', {}):
@@ -483,7 +487,7 @@ class SelfHealingService:
             if not model.get('triggerWords'):
                 model['triggerWords'] = scraped.get('trainedWords', [])
         
-        print(f"   ✅ Updated database entry for {model_path}")
+        return ids
     
     def _log_healing(self, result):
         """Log a healing attempt"""
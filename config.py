@@ -18,6 +18,12 @@ IMAGES_DIR = os.path.join(MODELS_DIR, 'images')
 # Backup directory location
 BACKUP_DIR = os.path.join(MODELS_DIR, 'db', 'backups')
 
+# Cached ffprobe results for the media audit, so unchanged videos aren't re-probed
+VIDEO_PROBE_CACHE_FILE = os.path.join(MODELS_DIR, 'db', 'video_probe_cache.json')
+
+# Cached CivArchive hash searches, so retries and repeat heals don't query the archive again
+ARCHIVE_CACHE_FILE = os.path.join(MODELS_DIR, 'db', 'archive_cache.json')
+
 # Backup configuration
 MAX_BACKUPS = 10  # Keep only the last 10 backups
 